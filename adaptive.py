@@ -0,0 +1,114 @@
+"""
+Adaptive-shot execution: sample in small batches and stop once decided.
+
+A decision rule looks at the running counts and Wilson score intervals
+and returns a decision once it holds at the chosen confidence, or None to
+ask for another batch. The confidence is split across all the batches that
+could be taken (a union bound), so stopping early does not inflate the
+error rate. Scripts enable this mode with FTLQ_ADAPTIVE=1.
+"""
+import math
+import os
+from dataclasses import dataclass
+from statistics import NormalDist
+from tracing import span
+
+def adaptive_mode() -> bool:
+    return os.environ.get("FTLQ_ADAPTIVE") == "1"
+
+def wilson_interval(successes: int, n: int, z: float) -> tuple[float, float]:
+    """Wilson score interval for a binomial proportion."""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z ** 2 / n
+    center = (p + z ** 2 / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+def threshold_decision(outcome: str, threshold: float, above: str, below: str):
+    """
+    Decide whether P(outcome) is above or below `threshold`, e.g. the
+    Deutsch-Jozsa rule "CONSTANT if P('000') > 0.95".
+    """
+    def decide(counts: dict, z: float):
+        low, high = wilson_interval(counts.get(outcome, 0), sum(counts.values()), z)
+        if low > threshold:
+            return above
+        if high < threshold or (z == 0 and low <= threshold):
+            return below
+        return None
+    return decide
+
+def top_outcome_decision():
+    """
+    Decide which outcome is the most probable (Bernstein-Vazirani secret,
+    Grover winner): the leader's lower bound must clear the runner-up's upper
+    bound.
+    """
+    def decide(counts: dict, z: float):
+        ranked = sorted(counts, key=counts.get, reverse=True)
+        n = sum(counts.values())
+        leader_low, _ = wilson_interval(counts[ranked[0]], n, z)
+        runner_up = counts[ranked[1]] if len(ranked) > 1 else 0
+        _, runner_up_high = wilson_interval(runner_up, n, z)
+        if leader_low > runner_up_high or z == 0:
+            return ranked[0]
+        return None
+    return decide
+
+@dataclass
+class AdaptiveResult:
+    decision: object
+    counts: dict
+    shots_used: int
+    shots_saved: int
+    decided_early: bool
+
+def adaptive_run(run_shots, decide, confidence: float = 0.99, batch_shots: int = 32,
+                 max_shots: int = 1000) -> AdaptiveResult:
+    """
+    Call `run_shots(shots) -> counts` in batches until `decide` returns a
+    decision, or `max_shots` is spent (then the point estimate is used).
+    """
+    looks = math.ceil(max_shots / batch_shots)
+    alpha = (1 - confidence) / looks
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    counts = {}
+    used = 0
+    while used < max_shots:
+        shots = min(batch_shots, max_shots - used)
+        for key, value in run_shots(shots).items():
+            counts[key] = counts.get(key, 0) + value
+        used += shots
+        decision = decide(counts, z)
+        if decision is not None:
+            return AdaptiveResult(decision, counts, used, max_shots - used, used < max_shots)
+    return AdaptiveResult(decide(counts, 0.0), counts, used, 0, False)
+
+def sampler_shots(sampler, circuit):
+    """`run_shots` for a SamplerV2 (e.g. inside a runtime Session)."""
+    def run_shots(shots):
+        with span("sampler.run", shots=shots):
+            return sampler.run([circuit], shots=shots).result()[0].join_data().get_counts()
+    return run_shots
+
+def backend_shots(backend, circuit):
+    """`run_shots` for a local backend such as the Aer simulator."""
+    def run_shots(shots):
+        with span("simulate", shots=shots):
+            return backend.run(circuit, shots=shots).result().get_counts()
+    return run_shots
+
+def exact_shots(circuit, simulator=None, seed: int | None = None):
+    """
+    `run_shots` drawing every batch from the circuit's exact distribution,
+    which is simulated once, so FTLQ_EXACT runs can still stop early.
+    """
+    import numpy as np
+    from exact import exact_probabilities, sample_counts
+    probabilities = exact_probabilities(circuit, simulator)
+    rng = np.random.default_rng(seed)
+    def run_shots(shots):
+        return sample_counts(probabilities, shots, rng)
+    return run_shots
@@ -0,0 +1,231 @@
+"""
+Backend discovery with concurrent status polling and a configuration cache.
+
+Static configuration data (qubit count, simulator flag, basis gates,
+coupling map, shot and circuit limits) changes rarely, so it is cached on
+disk, and each backend's entry expires `ttl` seconds after it was fetched.
+Live status (operational flag, queue length) is always fetched, but for all
+candidate backends at once from a thread pool instead of one
+`backend.status()` call after another.
+
+FakeService stands in for QiskitRuntimeService with configurable status()
+and configuration() latency, so this can be exercised offline:
+
+    python backend_select.py    # check that polling is concurrent and the TTL is honoured
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from tracing import span
+
+DEFAULT_CACHE_PATH = os.path.join(os.environ.get("FTLQ_CACHE_DIR", ".cache"), "backends.json")
+DEFAULT_TTL = 3600
+
+@dataclass
+class BackendInfo:
+    backend: object
+    name: str
+    num_qubits: int
+    simulator: bool
+    basis_gates: list = field(default_factory=list)
+    coupling_map: list | None = None
+    max_shots: int | None = None
+    max_experiments: int | None = None
+    operational: bool = False
+    pending_jobs: int = 0
+    status_msg: str = ""
+
+def _read_cache(path: str) -> dict:
+    """{backend name: {"fetched_at": ..., "config": {...}}} as stored on disk."""
+    try:
+        with open(path) as f:
+            return json.load(f).get("backends", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _load_cache(path: str, ttl: float) -> dict:
+    """{backend name: config} of the entries fetched less than `ttl` seconds ago."""
+    now = time.time()
+    return {name: entry["config"] for name, entry in _read_cache(path).items()
+            if now - entry.get("fetched_at", 0) <= ttl and "config" in entry}
+
+def _save_cache(path: str, configs: dict, ttl: float) -> None:
+    """Add freshly fetched configs, keeping other unexpired entries with their own timestamps."""
+    now = time.time()
+    entries = {name: entry for name, entry in _read_cache(path).items()
+               if now - entry.get("fetched_at", 0) <= ttl}
+    entries.update({name: {"fetched_at": now, "config": config} for name, config in configs.items()})
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"backends": entries}, f)
+    os.replace(tmp_path, path)
+
+def _fetch_config(backend) -> dict:
+    config = backend.configuration()
+    coupling_map = getattr(config, "coupling_map", None)
+    return {
+        "num_qubits": config.n_qubits,
+        "simulator": bool(config.simulator),
+        "basis_gates": list(getattr(config, "basis_gates", None) or []),
+        "coupling_map": [list(edge) for edge in coupling_map] if coupling_map else None,
+        "max_shots": getattr(config, "max_shots", None),
+        "max_experiments": getattr(config, "max_experiments", None),
+    }
+
+def poll_statuses(infos: list[BackendInfo], max_workers: int = 16) -> None:
+    """Fill in the live status of every BackendInfo, polling concurrently."""
+    if not infos:
+        return
+    with span("backend.status", backends=len(infos)), ThreadPoolExecutor(max_workers=max_workers) as executor:
+        statuses = executor.map(lambda info: info.backend.status(), infos)
+        for info, status in zip(infos, statuses):
+            info.operational = bool(status.operational)
+            info.pending_jobs = status.pending_jobs
+            info.status_msg = status.status_msg
+
+def backend_infos(service, max_workers: int = 16, cache_path: str = DEFAULT_CACHE_PATH,
+                  ttl: float = DEFAULT_TTL, with_status: bool = True, **filters) -> list[BackendInfo]:
+    """
+    Describe every backend of `service`, fetching configurations (when not
+    cached) and statuses concurrently. Extra keyword arguments are passed to
+    `service.backends()`.
+    """
+    with span("service.backends"):
+        backends = service.backends(**filters)
+    configs = _load_cache(cache_path, ttl)
+    missing = [b for b in backends if b.name not in configs]
+    if missing:
+        fetched = {}
+        with span("backend.configuration", backends=len(missing)), ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for backend, config in zip(missing, executor.map(_fetch_config, missing)):
+                fetched[backend.name] = config
+        # Only the fetched entries get a new timestamp; the others keep expiring on schedule.
+        _save_cache(cache_path, fetched, ttl)
+        configs.update(fetched)
+    infos = [BackendInfo(b, b.name, **configs[b.name]) for b in backends]
+    if with_status:
+        poll_statuses(infos, max_workers)
+    return infos
+
+def select_backend(service, min_qubits: int = 0, simulator: bool | None = False,
+                   key=lambda info: info.pending_jobs, max_workers: int = 16, **kwargs):
+    """
+    Pick an operational backend with at least `min_qubits` qubits.
+
+    `simulator=False` keeps real devices only and `None` allows both. Among
+    the candidates, the one with the smallest `key` wins (shortest queue by
+    default). Status is only polled for backends that pass the static filters.
+    """
+    with span("select_backend", min_qubits=min_qubits) as s:
+        infos = backend_infos(service, max_workers, with_status=False, **kwargs)
+        candidates = [
+            info for info in infos
+            if info.num_qubits >= min_qubits and (simulator is None or info.simulator == simulator)
+        ]
+        poll_statuses(candidates, max_workers)
+        ready = [info for info in candidates if info.operational]
+        if not ready:
+            raise RuntimeError("No real quantum devices available. Check your IBM Quantum account")
+        best = min(ready, key=key)
+        s.set(backend=best.name, pending_jobs=best.pending_jobs)
+        return best.backend
+
+class FakeBackend:
+    """Backend stand-in whose status() and configuration() sleep like remote calls."""
+
+    def __init__(self, service: "FakeService", name: str, num_qubits: int, pending_jobs: int = 0,
+                 operational: bool = True, simulator: bool = False):
+        self.service = service
+        self.name = name
+        self.num_qubits = num_qubits
+        self.pending_jobs = pending_jobs
+        self.operational = operational
+        self.simulator = simulator
+
+    def status(self):
+        self.service._call("status")
+        return SimpleNamespace(operational=self.operational, pending_jobs=self.pending_jobs,
+                               status_msg="active" if self.operational else "maintenance")
+
+    def configuration(self):
+        self.service._call("configuration")
+        edges = [[q, q + 1] for q in range(self.num_qubits - 1)]
+        return SimpleNamespace(n_qubits=self.num_qubits, simulator=self.simulator,
+                               basis_gates=["ecr", "id", "rz", "sx", "x"],
+                               coupling_map=edges + [list(reversed(edge)) for edge in edges],
+                               max_shots=100000, max_experiments=300)
+
+class FakeService:
+    """
+    Stand-in for QiskitRuntimeService: `backends()` lists FakeBackends whose
+    status() and configuration() calls take `status_delay` and
+    `configuration_delay` seconds. Filters passed to backends() are ignored.
+    Calls are counted per kind, along with the most that overlapped.
+    """
+
+    def __init__(self, backends: list[tuple[str, int, int]], status_delay: float = 0.2,
+                 configuration_delay: float = 0.2):
+        self.delays = {"status": status_delay, "configuration": configuration_delay}
+        self.calls = {"status": 0, "configuration": 0}
+        self.max_concurrent = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._backends = [FakeBackend(self, name, num_qubits, pending_jobs)
+                          for name, num_qubits, pending_jobs in backends]
+
+    def _call(self, kind: str) -> None:
+        with self._lock:
+            self.calls[kind] += 1
+            self._running += 1
+            self.max_concurrent = max(self.max_concurrent, self._running)
+        time.sleep(self.delays[kind])
+        with self._lock:
+            self._running -= 1
+
+    def backends(self, **filters) -> list[FakeBackend]:
+        return list(self._backends)
+
+def check_fake_service(num_backends: int = 8, delay: float = 0.3, ttl: float = 2.0) -> None:
+    """
+    Time backend selection against a FakeService: configurations and
+    statuses must be fetched concurrently, cached configurations reused
+    within `ttl` and each backend's entry expire on its own timestamp.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "backends.json")
+        specs = [(f"fake_{i}", 5 + i, 10 * (num_backends - i)) for i in range(num_backends)]
+        service = FakeService(specs, status_delay=delay, configuration_delay=delay)
+
+        start = time.perf_counter()
+        best = select_backend(service, min_qubits=6, cache_path=cache_path, ttl=ttl)
+        seconds = time.perf_counter() - start
+        # One round of configurations and one of statuses, not one per backend.
+        assert seconds < 4 * delay, seconds
+        assert service.max_concurrent == num_backends, service.max_concurrent
+        assert best.name == f"fake_{num_backends - 1}", best.name
+        print(f"Selected {best.name} from {num_backends} backends in {seconds:.2f} s "
+              f"({delay:.1f} s per call, {service.max_concurrent} calls at once)")
+
+        backend_infos(service, cache_path=cache_path, ttl=ttl, with_status=False)
+        assert service.calls["configuration"] == num_backends, service.calls
+        print("Configurations were reused from the cache within the TTL")
+
+        time.sleep(ttl / 2)
+        service._backends.append(FakeBackend(service, "fake_new", 27, 0))
+        infos = backend_infos(service, cache_path=cache_path, ttl=ttl, with_status=False)
+        assert service.calls["configuration"] == num_backends + 1, service.calls
+        assert infos[-1].coupling_map and infos[-1].basis_gates and infos[-1].max_shots
+        time.sleep(ttl / 2 + 0.1)
+        backend_infos(service, cache_path=cache_path, ttl=ttl, with_status=False)
+        # The older entries expired; the one added later is still fresh.
+        assert service.calls["configuration"] == 2 * num_backends + 1, service.calls
+        print("Each configuration expired on its own timestamp")
+
+if __name__ == "__main__":
+    check_fake_service()
@@ -0,0 +1,124 @@
+"""
+Run several algorithm circuits as one batched SamplerV2 workload.
+
+Every experiment's circuit is transpiled in one parallel `transpile` call,
+all circuits are submitted as PUBs of a few Sampler jobs inside a single
+Session (through job_manager, which journals the job IDs), and each result
+is routed back to that algorithm's post-processing as soon as it arrives.
+
+    python batch_runner.py            # least busy IBM device
+    python batch_runner.py --local    # local Aer simulator, no account needed
+    python batch_runner.py --device fake_guadalupe   # offline, with that device's noise
+    FTLQ_LOCAL=1 python batch_runner.py              # the same, with the default device
+"""
+import argparse
+import hashlib
+import importlib
+from dataclasses import dataclass
+from typing import Callable
+from qiskit import QuantumCircuit
+from backend_select import select_backend
+from fingerprint import circuit_fingerprint
+from job_manager import DEFAULT_JOURNAL, JobSpec, run_jobs
+from transpile_cache import cached_transpile
+from counts import SparseCounts
+from tracing import span
+import bernstein_vazirani
+import quantum_noise
+import simon
+
+# The module name has a hyphen, so it cannot be imported with a plain import statement.
+deutsch_jozsa = importlib.import_module("deutsch-jozsa")
+
+@dataclass
+class Experiment:
+    name: str
+    circuit: QuantumCircuit
+    postprocess: Callable[[dict], object]
+    shots: int = 1000
+
+def default_experiments() -> list[Experiment]:
+    """The runtime examples from this repository, as one batch."""
+    bv_secret = "101"
+    simon_secret = "101"
+    return [
+        Experiment("bell", quantum_noise.bell_circuit(), quantum_noise.error_rate, shots=500),
+        Experiment("deutsch_jozsa_constant",
+                   deutsch_jozsa.deutsch_jozsa_circuit(deutsch_jozsa.constant_oracle()),
+                   deutsch_jozsa.classify, shots=500),
+        Experiment("deutsch_jozsa_balanced",
+                   deutsch_jozsa.deutsch_jozsa_circuit(deutsch_jozsa.balanced_oracle()),
+                   deutsch_jozsa.classify, shots=500),
+        Experiment("bernstein_vazirani", bernstein_vazirani.bernstein_vazirani(bv_secret),
+                   bernstein_vazirani.secret_from_counts),
+        Experiment("simon", simon.simon_algorithm(simon_secret),
+                   lambda counts: {"secret": simon.recover_secret(counts),
+                                   "inconsistent": round(simon.inconsistent_fraction(simon_secret, counts), 3)}),
+    ]
+
+def run_batch(experiments: list[Experiment], backend, max_circuits: int | None = None,
+              num_processes: int | None = None, service=None, journal_path: str | None = None,
+              on_result: Callable[[str, dict], None] | None = None) -> dict:
+    """
+    Transpile and run all experiments in one Session, returning
+    {name: {"counts": ..., "result": postprocess(counts)}}.
+
+    With max_circuits set, the PUBs are split into several jobs of at most
+    that many circuits. All jobs are submitted up front through the JobManager
+    and each job's experiments are post-processed (and passed to `on_result`)
+    as soon as that job finishes. With a `service` and `journal_path`, an
+    interrupted batch re-attaches to its jobs when run again.
+    """
+    transpiled = cached_transpile([e.circuit for e in experiments], backend, num_processes=num_processes)
+    pubs = [(circuit, None, e.shots) for circuit, e in zip(transpiled, experiments)]
+    chunk = max_circuits or len(pubs)
+    results = {}
+
+    def collect(start: int):
+        def callback(name, job_result):
+            for experiment, pub_result in zip(experiments[start:start + chunk], job_result):
+                counts = SparseCounts.from_bitarray(pub_result.join_data())
+                results[experiment.name] = {"counts": counts, "result": experiment.postprocess(counts)}
+                if on_result is not None:
+                    on_result(experiment.name, results[experiment.name])
+        return callback
+
+    specs = []
+    for start in range(0, len(pubs), chunk):
+        # Named by content, so a rerun of the same batch finds its journaled jobs.
+        digest = hashlib.sha256("".join(circuit_fingerprint(c) for c in transpiled[start:start + chunk]).encode())
+        specs.append(JobSpec(f"batch-{start}-{digest.hexdigest()[:12]}", pubs[start:start + chunk], collect(start)))
+    from qiskit_ibm_runtime import Session, SamplerV2 as Sampler
+    with Session(backend=backend) as session:
+        run_jobs(specs, Sampler(mode=session), service, journal_path)
+    return {e.name: results[e.name] for e in experiments}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run all runtime examples as one batch")
+    parser.add_argument("--local", action="store_true", help="use the local Aer simulator")
+    parser.add_argument("--device", default=None,
+                        help="emulate this device (snapshot or fake backend) with its noise model")
+    parser.add_argument("--max-circuits", type=int, default=None, help="circuits per Sampler job")
+    args = parser.parse_args()
+
+    experiments = default_experiments()
+    service = None
+    from noise_emulator import local_device, noisy_simulator
+    # FTLQ_LOCAL (as set by `ftlq.py run batch --local`) picks the device like the other scripts.
+    device = args.device or local_device()
+    if device:
+        backend = noisy_simulator(device, num_qubits=max(e.circuit.num_qubits for e in experiments))
+    elif args.local:
+        from sim_select import simulator_for
+        backend = simulator_for([e.circuit for e in experiments])
+    else:
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        with span("runtime.service"):
+            service = QiskitRuntimeService()
+        backend = select_backend(service, min_qubits=max(e.circuit.num_qubits for e in experiments))
+    print(f"Using backend: {backend.name}")
+
+    # Results are printed as each job finishes; hardware runs keep a journal to resume from.
+    run_batch(experiments, backend, args.max_circuits, service=service,
+              journal_path=DEFAULT_JOURNAL if service else None,
+              on_result=lambda name, outcome: print(f"{name}: {outcome['result']}"))
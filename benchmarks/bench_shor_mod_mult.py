@@ -0,0 +1,76 @@
+"""
+Compare the dense and arithmetic controlled modular multipliers used by shor.py.
+
+For each register size n, a modulus N with n bits is picked and one controlled
+multiplier is built and decomposed to ['u', 'cx']. Build time, decomposed depth,
+CX count and peak Python memory (tracemalloc) are reported.
+
+    python benchmarks/bench_shor_mod_mult.py --max-bits 12 --dense-max-bits 6
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from qiskit import QuantumCircuit, transpile
+from qiskit.circuit.library import UnitaryGate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from shor import c_mod_mult_gate, mod_mult_unitary
+
+# Odd semiprimes with exactly n bits; 2 is coprime to all of them.
+MODULI = {4: 15, 5: 21, 6: 55, 7: 91, 8: 221, 9: 391, 10: 899, 11: 1763, 12: 3599}
+BASE = 2
+
+def dense_multiplier(N: int, n: int) -> QuantumCircuit:
+    qc = QuantumCircuit(n + 1)
+    qc.append(UnitaryGate(mod_mult_unitary(BASE, N, n)).control(1), range(n + 1))
+    return qc
+
+def arithmetic_multiplier(N: int, n: int) -> QuantumCircuit:
+    qc = QuantumCircuit(2 * n + 3)
+    qc.append(c_mod_mult_gate(BASE, N, n), range(2 * n + 3))
+    return qc
+
+def build_and_decompose(build, N: int, n: int):
+    qc = build(N, n)
+    return qc, transpile(qc, basis_gates=["u", "cx"], optimization_level=0)
+
+def measure(build, N: int, n: int) -> dict:
+    start = time.perf_counter()
+    qc, decomposed = build_and_decompose(build, N, n)
+    elapsed = time.perf_counter() - start
+    # Second pass for memory, since tracemalloc slows allocation-heavy code down.
+    tracemalloc.start()
+    build_and_decompose(build, N, n)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "qubits": qc.num_qubits,
+        "seconds": elapsed,
+        "depth": decomposed.depth(),
+        "cx": decomposed.count_ops().get("cx", 0),
+        "peak_mb": peak / 2 ** 20,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--min-bits", type=int, default=4)
+    parser.add_argument("--max-bits", type=int, default=10)
+    parser.add_argument("--dense-max-bits", type=int, default=6,
+                        help="largest n for the dense path (cost grows as 4^n)")
+    args = parser.parse_args()
+
+    print(f"{'n':>3} {'N':>5} {'method':>10} {'qubits':>6} {'seconds':>9} {'depth':>8} {'cx':>8} {'peak MB':>8}")
+    for n in range(args.min_bits, args.max_bits + 1):
+        N = MODULI[n]
+        methods = [("arithmetic", arithmetic_multiplier)]
+        if n <= args.dense_max_bits:
+            methods.insert(0, ("dense", dense_multiplier))
+        for name, build in methods:
+            row = measure(build, N, n)
+            print(f"{n:>3} {N:>5} {name:>10} {row['qubits']:>6} {row['seconds']:>9.3f} "
+                  f"{row['depth']:>8} {row['cx']:>8} {row['peak_mb']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
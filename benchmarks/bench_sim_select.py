@@ -0,0 +1,80 @@
+"""
+Find the crossover points between Aer's statevector, stabilizer and MPS methods.
+
+Three circuit families are run at growing widths with every method that
+applies: Bernstein-Vazirani (Clifford), a GHZ chain (Clifford, one bond) and
+a brickwork of RY rotations and nearest-neighbour CX (non-Clifford, low
+entanglement). Statevector runs stop at --statevector-max-qubits. The last
+column is the method sim_select would pick.
+
+    python benchmarks/bench_sim_select.py --widths 8,12,16,20,24,50,100
+"""
+import argparse
+import os
+import sys
+import time
+from qiskit import QuantumCircuit
+from qiskit_aer import AerSimulator
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bernstein_vazirani import bernstein_vazirani
+from sim_select import is_clifford, select_method
+
+METHODS = ["statevector", "stabilizer", "matrix_product_state"]
+
+def bv(n: int) -> QuantumCircuit:
+    return bernstein_vazirani("10" * (n // 2) + "1" * (n % 2))
+
+def ghz(n: int) -> QuantumCircuit:
+    qc = QuantumCircuit(n, n)
+    qc.h(0)
+    for q in range(n - 1):
+        qc.cx(q, q + 1)
+    qc.measure(range(n), range(n))
+    return qc
+
+def brickwork(n: int, layers: int = 2) -> QuantumCircuit:
+    qc = QuantumCircuit(n, n)
+    for layer in range(layers):
+        qc.ry(0.3 + 0.1 * layer, range(n))
+        for q in range(layer % 2, n - 1, 2):
+            qc.cx(q, q + 1)
+    qc.measure(range(n), range(n))
+    return qc
+
+FAMILIES = {"bv": bv, "ghz": ghz, "brickwork": brickwork}
+
+def run_seconds(circuit: QuantumCircuit, method: str, shots: int) -> float:
+    # The circuits only use gates all methods support natively, so they are not
+    # transpiled (the MPS target would reject more than 63 qubits).
+    simulator = AerSimulator(method=method)
+    start = time.perf_counter()
+    simulator.run(circuit, shots=shots).result()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--widths", default="4,8,12,16,20,24,32,64,100",
+                        help="comma-separated total qubit counts")
+    parser.add_argument("--shots", type=int, default=1000)
+    parser.add_argument("--statevector-max-qubits", type=int, default=26)
+    args = parser.parse_args()
+
+    print(f"{'family':>10} {'qubits':>6} " + " ".join(f"{m[:12]:>12}" for m in METHODS) + f" {'auto':>12}")
+    for family, build in FAMILIES.items():
+        for width in map(int, args.widths.split(",")):
+            # Bernstein-Vazirani uses one ancilla on top of the secret's bits.
+            circuit = build(width - 1) if family == "bv" else build(width)
+            cells = []
+            for method in METHODS:
+                if method == "statevector" and circuit.num_qubits > args.statevector_max_qubits:
+                    cells.append("-")
+                elif method == "stabilizer" and not is_clifford(circuit):
+                    cells.append("n/a")
+                else:
+                    cells.append(f"{run_seconds(circuit, method, args.shots):.4f}")
+            auto = select_method(circuit)
+            print(f"{family:>10} {circuit.num_qubits:>6} " + " ".join(f"{c:>12}" for c in cells) + f" {auto[:12]:>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Time the build, transpile, simulate and postprocess phases of every algorithm.
+
+Each case (one algorithm at one size) runs in a fresh process so that caches
+and imports from earlier cases do not hide cold-start costs. Every phase is
+timed with perf_counter, after a throwaway transpile and run of a one-qubit
+circuit has loaded Qiskit's transpiler passes and Aer; a second run, in another fresh process, records the
+peak Python memory of each phase with tracemalloc. The peak RSS of the timing
+process is reported too. With --out, the results are written as JSON along
+with the commit they were measured on, so runs can be compared over time.
+
+    python benchmarks/run.py --out bench.json
+    python benchmarks/run.py --cases bv,grover --size bv=16,64,128 --baseline bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from sweep import parse_grid_option
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PHASES = ("build", "transpile", "simulate", "postprocess")
+
+def _circuit_phases(build, postprocess, shots: int) -> list:
+    """The four phases of a measured circuit run on the simulator sim_select picks."""
+    from qiskit import transpile
+    from counts import SparseCounts
+    from sim_select import simulator_for
+
+    def transpile_phase(circuit):
+        simulator = simulator_for(circuit)
+        return simulator, transpile(circuit, simulator)
+
+    def simulate_phase(prepared):
+        simulator, circuit = prepared
+        return SparseCounts.from_result(simulator.run(circuit, shots=shots).result())
+
+    return [("build", lambda _: build()), ("transpile", transpile_phase),
+            ("simulate", simulate_phase), ("postprocess", postprocess)]
+
+def superposition_case(size, shots: int) -> list:
+    from superposition import superposition_circuit
+    return _circuit_phases(superposition_circuit, lambda counts: counts.probabilities_dict(), shots)
+
+def entanglement_case(size, shots: int) -> list:
+    from entanglement import bell_circuit
+    return _circuit_phases(bell_circuit, lambda counts: counts.probabilities_dict(), shots)
+
+def deutsch_jozsa_case(size, shots: int) -> list:
+    dj = import_module("deutsch-jozsa")
+    return _circuit_phases(lambda: dj.deutsch_jozsa_circuit(dj.balanced_oracle()), dj.classify, shots)
+
+def bv_case(qubits: int, shots: int) -> list:
+    from bernstein_vazirani import bernstein_vazirani
+    secret = ("10" * qubits)[:qubits]
+    return _circuit_phases(lambda: bernstein_vazirani(secret),
+                           lambda counts: counts.most_frequent() == secret, shots)
+
+def simon_case(qubits: int, shots: int) -> list:
+    from simon import recover_secret, simon_algorithm
+    secret = ("1" + "0" * qubits)[:qubits - 1] + "1"
+    return _circuit_phases(lambda: simon_algorithm(secret),
+                           lambda counts: recover_secret(counts) == secret, shots)
+
+def grover_case(qubits: int, shots: int) -> list:
+    from grover import grover_circuit
+    target = "1" * qubits
+    return _circuit_phases(lambda: grover_circuit(qubits, {target}),
+                           lambda counts: counts.most_frequent() == target, shots)
+
+def qpe_case(n_count: int, shots: int) -> list:
+    from qpe import phase_unitary, qpe_circuit
+    return _circuit_phases(lambda: qpe_circuit(n_count, phase_unitary(5 / 16)),
+                           lambda counts: int(counts.most_frequent(), 2) / 2 ** n_count, shots)
+
+def shor_case(N: int, shots: int) -> list:
+    from math import gcd
+    from shor import factors_from_period, find_period, shor_circuit_custom, shor_sizes
+    t, n = shor_sizes(N)
+    a = next(a for a in range(2, N) if gcd(a, N) == 1)
+
+    def postprocess(counts):
+        period = find_period(counts, a, N, t)
+        return period and factors_from_period(a, N, period)
+
+    return _circuit_phases(lambda: shor_circuit_custom(N, a, t, n), postprocess, shots)
+
+def vqe_case(maxiter: int, shots: int) -> list:
+    from vqe import VQEEngine, hamiltonian, optimize, parameterized_ansatz
+    # Creating the engine transpiles the ansatz; the optimizer loop is the simulation.
+    return [("build", lambda _: parameterized_ansatz()),
+            ("transpile", lambda built: VQEEngine(*built, hamiltonian.expectation)),
+            ("simulate", lambda engine: optimize(engine, [0.0, 0.0], maxiter)),
+            ("postprocess", lambda result: float(result.fun) - hamiltonian.ground_state_energy())]
+
+# name -> (case, scaling knob, default sizes)
+CASES = {
+    "superposition": (superposition_case, None, [None]),
+    "entanglement": (entanglement_case, None, [None]),
+    "deutsch_jozsa": (deutsch_jozsa_case, None, [None]),
+    "bv": (bv_case, "qubits", [8, 16, 64, 256]),
+    "simon": (simon_case, "qubits", [4, 8, 16, 32]),
+    "grover": (grover_case, "qubits", [4, 6, 8, 10]),
+    "qpe": (qpe_case, "n_count", [4, 6, 8, 10]),
+    "shor": (shor_case, "N", [15, 21, 33]),
+    "vqe": (vqe_case, "maxiter", [10, 50, 200]),
+}
+
+def _warm_up() -> None:
+    from qiskit import QuantumCircuit, transpile
+    from qiskit_aer import AerSimulator
+    qc = QuantumCircuit(1, 1)
+    qc.h(0)
+    qc.measure(0, 0)
+    simulator = AerSimulator()
+    simulator.run(transpile(qc, simulator), shots=1).result()
+
+def _run_case(name: str, size, shots: int, trace_memory: bool) -> dict:
+    """Run every phase of one case; called in a fresh worker process."""
+    phases = CASES[name][0](size, shots)
+    _warm_up()
+    seconds, peak_mb, value, qubits = {}, {}, None, None
+    if trace_memory:
+        tracemalloc.start()
+    for phase, fn in phases:
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        value = fn(value)
+        seconds[phase] = time.perf_counter() - start
+        if trace_memory:
+            peak_mb[phase] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        if phase == "build":
+            circuit = value[0] if isinstance(value, tuple) else value
+            qubits = getattr(circuit, "num_qubits", None)
+    if trace_memory:
+        tracemalloc.stop()
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+    return {"seconds": seconds, "peak_mb": peak_mb, "peak_rss_mb": rss,
+            "qubits": qubits, "result": value}
+
+def _in_fresh_process(*args) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_case, *args).result()
+
+def measure(name: str, size, shots: int = 1000, repeat: int = 1) -> dict:
+    """Median phase times over `repeat` cold runs, then one run under tracemalloc."""
+    runs = [_in_fresh_process(name, size, shots, False) for _ in range(repeat)]
+    memory = _in_fresh_process(name, size, shots, True)
+    seconds = {phase: statistics.median(run["seconds"][phase] for run in runs) for phase in PHASES}
+    return {
+        "case": name,
+        "knob": CASES[name][1],
+        "size": size,
+        "qubits": runs[0]["qubits"],
+        "seconds": seconds,
+        "total_seconds": sum(seconds.values()),
+        "peak_mb": memory["peak_mb"],
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "result": runs[0]["result"],
+    }
+
+def _git(*args) -> str | None:
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> dict:
+    import numpy
+    import qiskit
+    import qiskit_aer
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "qiskit": qiskit.__version__,
+        "qiskit_aer": qiskit_aer.__version__,
+        "numpy": numpy.__version__,
+    }
+
+def _baseline_totals(path: str) -> dict:
+    with open(path) as f:
+        return {(row["case"], row["size"]): row["total_seconds"] for row in json.load(f)["results"]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", default=",".join(CASES),
+                        help=f"comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument("--size", action="append", type=parse_grid_option, default=[],
+                        help="case=v1,v2,... overrides the sizes of a case (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="only the smallest size of each case")
+    parser.add_argument("--shots", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=1, help="cold runs per case; the median is reported")
+    parser.add_argument("--out", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare total times with")
+    args = parser.parse_args()
+
+    names = [name for name in args.cases.split(",") if name]
+    unknown = set(names) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    sizes = {name: CASES[name][2] for name in names}
+    sizes.update(dict(args.size))
+    baseline = _baseline_totals(args.baseline) if args.baseline else {}
+
+    print(f"{'case':>14} {'size':>6} {'qubits':>6} " + " ".join(f"{p:>11}" for p in PHASES)
+          + f" {'total s':>8} {'peak MB':>8} {'RSS MB':>7}" + (f" {'vs base':>8}" if baseline else ""))
+    results = []
+    for name in names:
+        for size in sizes[name][:1] if args.quick else sizes[name]:
+            row = measure(name, size, args.shots, args.repeat)
+            results.append(row)
+            line = (f"{name:>14} {str(size or '-'):>6} {str(row['qubits']):>6} "
+                    + " ".join(f"{row['seconds'][p]:>11.4f}" for p in PHASES)
+                    + f" {row['total_seconds']:>8.3f} {max(row['peak_mb'].values()):>8.1f}"
+                    + f" {row['peak_rss_mb']:>7.0f}")
+            if (name, size) in baseline:
+                line += f" {row['total_seconds'] / baseline[name, size]:>7.2f}x"
+            print(line, flush=True)
+
+    if args.out:
+        report = {**environment(), "shots": args.shots, "repeat": args.repeat, "results": results}
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
-from qiskit import QuantumCircuit, transpile
-import os
-from qiskit_ibm_runtime import QiskitRuntimeService, Session, SamplerV2 as Sampler
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
+from qiskit import QuantumCircuit
+from transpile_cache import cached_transpile
+from counts import SparseCounts
+from plotting import render, save_circuit_diagram, save_histogram
+from backend_select import select_backend
+from noise_emulator import local_device, noisy_simulator
+from tracing import span
+from adaptive import adaptive_mode, adaptive_run, sampler_shots, top_outcome_decision
 
 def bv_oracle(secret_string: str) -> QuantumCircuit:
     n = len(secret_string)
@@ -24,36 +27,48 @@ def bernstein_vazirani(secret_string: str) -> QuantumCircuit:
     qc.measure(range(n), range(n))
     return qc
 
-service = QiskitRuntimeService()
+def secret_from_counts(counts: dict) -> str:
+    """The hidden string is the most frequently measured outcome."""
+    return max(counts, key=counts.get)
 
-secret = "101"  # Secret string to find
-bv_circuit = bernstein_vazirani(secret)
+if __name__ == "__main__":
+    secret = "101"  # Secret string to find
+    bv_circuit = bernstein_vazirani(secret)
 
-os.makedirs("images", exist_ok=True)
-bv_circuit.draw('mpl', filename="images/bv_circuit.png")
-plt.close()
-print("Circuit saved to 'images/bv_circuit.png'")
+    save_circuit_diagram(bv_circuit, "images/bv_circuit.png")
 
-backends = service.backends(simulator=False, operational=True)
-if not backends:
-    raise RuntimeError("No real quantum devices available. Check your IBM Quantum account")
-backend = min(backends, key=lambda x: x.status().pending_jobs)
-print(f"Using backend: {backend.name}")
+    device = local_device()
+    if device:
+        backend = noisy_simulator(device, num_qubits=bv_circuit.num_qubits)
+        print(f"Emulating {device} locally")
+    else:
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        with span("runtime.service"):
+            service = QiskitRuntimeService()
+        backend = select_backend(service, min_qubits=bv_circuit.num_qubits)
+        print(f"Using backend: {backend.name}")
 
-transpiled_bv = transpile(bv_circuit, backend=backend)
+    transpiled_bv = cached_transpile(bv_circuit, backend)
 
-with Session(backend=backend) as session:
-    sampler = Sampler(mode=session)
-    job = sampler.run([transpiled_bv], shots=1000)
-    result = job.result()
+    from qiskit_ibm_runtime import Session, SamplerV2 as Sampler
+    with Session(backend=backend) as session:
+        sampler = Sampler(mode=session)
+        if adaptive_mode():
+            # Stop once the leading string clearly beats the runner-up.
+            outcome = adaptive_run(sampler_shots(sampler, transpiled_bv), top_outcome_decision(), max_shots=1000)
+            counts, found = SparseCounts.from_dict(outcome.counts), outcome.decision
+            print(f"Decided after {outcome.shots_used} shots ({outcome.shots_saved} of 1000 saved)")
+        else:
+            with span("job.submit"):
+                job = sampler.run([transpiled_bv], shots=1000)
+            with span("job.wait", job_id=job.job_id()):
+                sampler_result = job.result()
+            counts = SparseCounts.from_bitarray(sampler_result[0].data.c)
+            found = counts.most_frequent()
 
-counts = result[0].data.c.get_counts()
-probabilities = {k: v/1000 for k, v in counts.items()}
+    save_histogram(counts, "images/bv_results.png", title="Bernstein-Vazirani Results")
 
-fig = plot_histogram(probabilities, title="Bernstein-Vazirani Results")
-fig.savefig("images/bv_results.png", bbox_inches="tight")
-print("Results saved to 'images/bv_results.png'")
+    # Print most probable result
+    print(f"Secret string found: {found}")
 
-# Print most probable result
-most_probable = max(probabilities, key=probabilities.get)
-print(f"Secret string found: {most_probable}")
\ No newline at end of file
+    render()
@@ -0,0 +1,169 @@
+"""
+Compact measurement counts for wide registers.
+
+SparseCounts keeps the distinct outcomes as packed integers in a NumPy array
+of shape (k, words), with the most significant 64-bit word first, next to a
+uint32 array of their counts. Rows are kept sorted and unique. Sampler
+BitArrays and Aer's hex counts are packed directly without building
+bitstrings, so millions of shots of a 100-qubit register cost 12 bytes per
+distinct outcome instead of a Python string and int each.
+
+SparseCounts is a read-only Mapping from bitstrings (Qiskit order, bit 0
+rightmost) to counts, so code written for `get_counts()` dicts keeps
+working, while top_k, marginal, merge and probabilities run vectorized.
+"""
+from collections.abc import Mapping
+import numpy as np
+
+def _words(num_bits: int) -> int:
+    return max(1, -(-num_bits // 64))
+
+def _pack_ints(values, num_bits: int) -> np.ndarray:
+    """Python ints -> (k, words) uint64 rows, most significant word first."""
+    words = _words(num_bits)
+    if words == 1:
+        return np.fromiter(values, dtype=np.uint64).reshape(-1, 1)
+    mask = 2 ** 64 - 1
+    rows = [[(v >> (64 * (words - 1 - w))) & mask for w in range(words)] for v in values]
+    return np.array(rows, dtype=np.uint64).reshape(-1, words)
+
+class SparseCounts(Mapping):
+    __slots__ = ("num_bits", "outcomes", "counts")
+
+    def __init__(self, outcomes: np.ndarray, counts: np.ndarray, num_bits: int):
+        outcomes = np.asarray(outcomes, dtype=np.uint64).reshape(len(counts), _words(num_bits))
+        counts = np.asarray(counts, dtype=np.uint64)
+        if len(counts) and outcomes.shape[1] == 1:
+            unique, inverse = np.unique(outcomes[:, 0], return_inverse=True)
+            unique = unique.reshape(-1, 1)
+        elif len(counts):
+            unique, inverse = np.unique(outcomes, axis=0, return_inverse=True)
+        else:
+            unique, inverse = outcomes, np.zeros(0, dtype=np.intp)
+        summed = np.zeros(len(unique), dtype=np.uint64)
+        np.add.at(summed, inverse.ravel(), counts)
+        self.num_bits = num_bits
+        self.outcomes = unique
+        self.counts = summed.astype(np.uint32)
+
+    @classmethod
+    def from_dict(cls, counts: dict, num_bits: int | None = None) -> "SparseCounts":
+        """From a bitstring-keyed (or Aer hex-keyed, with num_bits) counts dict."""
+        keys = [key.replace(" ", "") for key in counts]
+        if num_bits is None:
+            if any(key.startswith("0x") for key in keys):
+                raise ValueError("num_bits is needed for hex-keyed counts")
+            num_bits = max((len(key) for key in keys), default=0)
+        values = (int(key, 16) if key.startswith("0x") else int(key, 2) for key in keys)
+        return cls(_pack_ints(values, num_bits), np.fromiter(counts.values(), dtype=np.uint64), num_bits)
+
+    @classmethod
+    def from_bitarray(cls, bit_array) -> "SparseCounts":
+        """From a SamplerV2 BitArray, without going through bitstrings."""
+        data = np.asarray(bit_array.array, dtype=np.uint8).reshape(-1, bit_array.array.shape[-1])
+        words = _words(bit_array.num_bits)
+        # Rows are big-endian bytes; left-pad them to whole 64-bit words.
+        padded = np.zeros((len(data), 8 * words), dtype=np.uint8)
+        padded[:, 8 * words - data.shape[1]:] = data
+        outcomes = padded.view(">u8").astype(np.uint64)
+        return cls(outcomes, np.ones(len(outcomes), dtype=np.uint64), bit_array.num_bits)
+
+    @classmethod
+    def from_result(cls, result, experiment: int = 0) -> "SparseCounts":
+        """From an Aer Result, reading its hex counts directly."""
+        num_bits = result.results[experiment].header.memory_slots
+        return cls.from_dict(result.data(experiment)["counts"], num_bits)
+
+    @classmethod
+    def merge(cls, *parts: "SparseCounts") -> "SparseCounts":
+        """Combine partial results (e.g. batches of shots) of the same register."""
+        if len({part.num_bits for part in parts}) > 1:
+            raise ValueError("Cannot merge counts of different register widths")
+        return cls(np.concatenate([part.outcomes for part in parts]),
+                   np.concatenate([part.counts for part in parts]), parts[0].num_bits)
+
+    def __add__(self, other: "SparseCounts") -> "SparseCounts":
+        return SparseCounts.merge(self, other)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum(dtype=np.uint64))
+
+    def probabilities(self) -> np.ndarray:
+        """Normalized frequencies, aligned with `outcomes`."""
+        return self.counts / max(self.total, 1)
+
+    def probabilities_dict(self) -> dict:
+        return dict(zip(self.bitstrings(), self.probabilities().tolist()))
+
+    def bitstrings(self, rows: np.ndarray | None = None) -> list[str]:
+        outcomes = self.outcomes if rows is None else self.outcomes[rows]
+        values = outcomes[:, 0].tolist()
+        for w in range(1, outcomes.shape[1]):
+            values = [(high << 64) | low for high, low in zip(values, outcomes[:, w].tolist())]
+        return [format(v, f"0{self.num_bits}b") for v in values]
+
+    def top_k(self, k: int) -> list[tuple[str, int]]:
+        """The k most frequent outcomes, most frequent first."""
+        k = min(k, len(self.counts))
+        if k == 0:
+            return []
+        rows = np.argpartition(-self.counts.astype(np.int64), k - 1)[:k]
+        rows = rows[np.argsort(-self.counts[rows].astype(np.int64), kind="stable")]
+        return list(zip(self.bitstrings(rows), self.counts[rows].tolist()))
+
+    def most_frequent(self) -> str:
+        return self.top_k(1)[0][0]
+
+    def marginal(self, bits: list[int]) -> "SparseCounts":
+        """Counts over the given bit indices; bit j of the result is bits[j]."""
+        words = self.outcomes.shape[1]
+        new_words = _words(len(bits))
+        marginal = np.zeros((len(self.counts), new_words), dtype=np.uint64)
+        for j, b in enumerate(bits):
+            if not 0 <= b < self.num_bits:
+                raise IndexError(f"Bit {b} outside a {self.num_bits}-bit register")
+            bit = (self.outcomes[:, words - 1 - b // 64] >> np.uint64(b % 64)) & np.uint64(1)
+            marginal[:, new_words - 1 - j // 64] |= bit << np.uint64(j % 64)
+        return SparseCounts(marginal, self.counts, len(bits))
+
+    def _row(self, key: str) -> int | None:
+        if len(key) != self.num_bits or not len(self.counts):
+            return None
+        target = _pack_ints([int(key, 2)], self.num_bits)[0]
+        if len(target) == 1:
+            row = int(np.searchsorted(self.outcomes[:, 0], target[0]))
+            return row if row < len(self.counts) and self.outcomes[row, 0] == target[0] else None
+        # Rows are sorted lexicographically, most significant word first.
+        lo, hi, target = 0, len(self.counts), tuple(target.tolist())
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tuple(self.outcomes[mid].tolist()) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self.counts) and tuple(self.outcomes[lo].tolist()) == target else None
+
+    def __getitem__(self, key: str) -> int:
+        row = self._row(key.replace(" ", ""))
+        if row is None:
+            raise KeyError(key)
+        return int(self.counts[row])
+
+    def __iter__(self):
+        return iter(self.bitstrings())
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def keys(self) -> list[str]:
+        return self.bitstrings()
+
+    def values(self) -> list[int]:
+        return self.counts.tolist()
+
+    def items(self) -> list[tuple[str, int]]:
+        return list(zip(self.bitstrings(), self.counts.tolist()))
+
+    def __repr__(self) -> str:
+        return f"SparseCounts({len(self)} outcomes of {self.num_bits} bits, {self.total} shots)"
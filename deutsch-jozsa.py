@@ -1,12 +1,11 @@
-import os
-from qiskit import QuantumCircuit, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, Session
-from qiskit_ibm_runtime import SamplerV2 as Sampler
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
-
-# Initialize service (credentials must be saved first)
-service = QiskitRuntimeService()
+from qiskit import QuantumCircuit
+from transpile_cache import cached_transpile
+from counts import SparseCounts
+from plotting import render, save_circuit_diagram, save_histogram
+from backend_select import select_backend
+from noise_emulator import local_device, noisy_simulator
+from tracing import span
+from adaptive import adaptive_mode, adaptive_run, sampler_shots, threshold_decision
 
 def deutsch_jozsa_circuit(oracle: QuantumCircuit) -> QuantumCircuit:
     """Create a Deutsch-Jozsa circuit for a 3-input function (4 total qubits)."""
@@ -44,45 +43,60 @@ def balanced_oracle() -> QuantumCircuit:
     oracle.cx(2, 3)
     return oracle
 
-# Example usage with a constant oracle
-oracle = constant_oracle()  # Change to balanced_oracle() for balanced case
-dj_circuit = deutsch_jozsa_circuit(oracle)
+def classify(counts: dict) -> str:
+    """CONSTANT if '000' was measured with probability above 0.95, else BALANCED."""
+    shots = sum(counts.values())
+    if counts.get('000', 0) / shots > 0.95:
+        return "CONSTANT"
+    return "BALANCED"
+
+if __name__ == "__main__":
+    # Example usage with a constant oracle
+    oracle = constant_oracle()  # Change to balanced_oracle() for balanced case
+    dj_circuit = deutsch_jozsa_circuit(oracle)
 
-# Draw the full circuit
-os.makedirs("images", exist_ok=True)
-dj_circuit.draw('mpl', filename="images/deutsch_jozsa_circuit.png")
-plt.close()
-print("Circuit saved to 'images/deutsch_jozsa_circuit.png'")
+    # Draw the full circuit
+    save_circuit_diagram(dj_circuit, "images/deutsch_jozsa_circuit.png")
 
-# Get backend
-backends = service.backends()
-print("Available backends:", [b.name for b in backends])
-if not backends:
-    raise RuntimeError("No real quantum devices available. Check your IBM Quantum account")
-backend = min(backends, key=lambda x: x.status().pending_jobs)
-print(f"Using backend: {backend.name}")
+    # Get backend
+    device = local_device()
+    if device:
+        # Offline: emulate the device with its noise model
+        backend = noisy_simulator(device, num_qubits=dj_circuit.num_qubits)
+        print(f"Emulating {device} locally")
+    else:
+        # Initialize service (credentials must be saved first)
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        with span("runtime.service"):
+            service = QiskitRuntimeService()
+        backend = select_backend(service, min_qubits=dj_circuit.num_qubits)
+        print(f"Using backend: {backend.name}")
 
-# Transpile circuit
-transpiled_dj = transpile(dj_circuit, backend=backend)
+    # Transpile circuit
+    transpiled_dj = cached_transpile(dj_circuit, backend)
 
-# Run the algorithm
-with Session(backend=backend) as session:
-    sampler = Sampler(mode=session)
-    job = sampler.run([transpiled_dj], shots=500)
-    result = job.result()
+    # Run the algorithm (runtime is imported here so importing the circuits stays light)
+    from qiskit_ibm_runtime import Session, SamplerV2 as Sampler
+    with Session(backend=backend) as session:
+        sampler = Sampler(mode=session)
+        if adaptive_mode():
+            # Stop as soon as P('000') is confidently above or below 0.95.
+            decide = threshold_decision('000', 0.95, "CONSTANT", "BALANCED")
+            outcome = adaptive_run(sampler_shots(sampler, transpiled_dj), decide, max_shots=500)
+            counts, function_type = SparseCounts.from_dict(outcome.counts), outcome.decision
+            print(f"Decided after {outcome.shots_used} shots ({outcome.shots_saved} of 500 saved)")
+        else:
+            with span("job.submit"):
+                job = sampler.run([transpiled_dj], shots=500)
+            with span("job.wait", job_id=job.job_id()):
+                sampler_result = job.result()
+            counts = SparseCounts.from_bitarray(sampler_result[0].data.c)
+            function_type = classify(counts)
 
-# Analyze results
-counts = result[0].data.c.get_counts()
-probabilities = {k: v/500 for k, v in counts.items()}
+    # Determine function type
+    print(f"Function is {function_type}")
 
-# Determine function type
-if '000' in probabilities and probabilities['000'] > 0.95:
-    print("Function is CONSTANT")
-else:
-    print("Function is BALANCED")
+    # Plot results
+    save_histogram(counts, "images/deutsch_jozsa_results.png", title="Deutsch-Jozsa Results", ylabel="Probability")
 
-# Plot results
-fig = plot_histogram(probabilities, title="Deutsch-Jozsa Results")
-fig.get_axes()[0].set_ylabel("Probability")
-fig.savefig("images/deutsch_jozsa_results.png", bbox_inches="tight")
-print("Results saved to 'images/deutsch_jozsa_results.png'")
\ No newline at end of file
+    render()
@@ -1,36 +1,42 @@
-import os
 from qiskit import QuantumCircuit
-from qiskit_aer import Aer
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
+from exact import exact_mode, exact_probabilities
+from plotting import render, save_circuit_diagram, save_histogram
+from sim_select import simulator_for
+from result_store import run_counts
 
-# Create a 2-qubit circuit
-qc = QuantumCircuit(2, 2)
+def bell_circuit() -> QuantumCircuit:
+    # Create a 2-qubit circuit
+    qc = QuantumCircuit(2, 2)
 
-# Create superposition on qubit 0
-qc.h(0)
+    # Create superposition on qubit 0
+    qc.h(0)
 
-# Entangle qubit 0 and 1 (CNOT gate)
-qc.cx(0, 1)
+    # Entangle qubit 0 and 1 (CNOT gate)
+    qc.cx(0, 1)
 
-# Measure both qubits
-qc.measure([0, 1], [0, 1])
+    # Measure both qubits
+    qc.measure([0, 1], [0, 1])
+    return qc
 
-# Draw the circuit
-os.makedirs("images", exist_ok=True)
-qc.draw('mpl')
-plt.savefig("images/bell_circuit.png")
-print("Circuit saved to 'images/bell_circuit.png'")
+if __name__ == "__main__":
+    qc = bell_circuit()
 
-# Simulate with 500 shots
-simulator = Aer.get_backend('qasm_simulator')
-result = simulator.run(qc, shots=500).result()
-counts = result.get_counts()
+    # Draw the circuit
+    save_circuit_diagram(qc, "images/bell_circuit.png")
 
-probabilities = {state: count/500 for state, count in counts.items()}
+    # Simulate with 500 shots
+    simulator = simulator_for(qc)
+    if exact_mode():
+        probabilities = exact_probabilities(qc, simulator)
+    else:
+        probabilities = run_counts(qc, simulator, shots=500)
 
-# Plot results
-fig = plot_histogram(probabilities)
-fig.get_axes()[0].set_ylabel("Probability")
-plt.savefig("images/bell_state_results.png")
-print("Results saved to 'images/bell_state_results.png'")
\ No newline at end of file
+    # Print the measured probabilities
+    total = sum(probabilities.values())
+    for state, value in sorted(probabilities.items()):
+        print(f"{state}: {value / total:.3f}")
+
+    # Plot results
+    save_histogram(probabilities, "images/bell_state_results.png", ylabel="Probability")
+
+    render()
@@ -0,0 +1,67 @@
+"""
+Exact (noiseless) outcome distributions without shot sampling.
+
+Final measurements are replaced by a single Aer `save_probabilities` on the
+measured qubits, so one statevector simulation gives the whole marginal
+distribution. Counts, when needed (e.g. by adaptive stopping rules), are
+drawn from that distribution with NumPy instead of re-running the simulator.
+
+Scripts switch to this mode when the FTLQ_EXACT environment variable is "1".
+"""
+import os
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit_aer import AerSimulator
+from tracing import span
+
+def exact_mode() -> bool:
+    return os.environ.get("FTLQ_EXACT") == "1"
+
+def measured_qubits(circuit: QuantumCircuit) -> dict:
+    """Map clbit index -> qubit index for the circuit's final measurements."""
+    mapping = {}
+    for instruction in circuit.data:
+        if instruction.operation.name == "measure":
+            qubit = circuit.find_bit(instruction.qubits[0]).index
+            clbit = circuit.find_bit(instruction.clbits[0]).index
+            mapping[clbit] = qubit
+        elif mapping and any(circuit.find_bit(q).index in mapping.values() for q in instruction.qubits):
+            if instruction.operation.name != "barrier":
+                raise ValueError("Exact mode needs all measurements at the end of the circuit")
+    return mapping
+
+def exact_probabilities(circuit: QuantumCircuit, simulator: AerSimulator | None = None,
+                        threshold: float = 1e-12) -> dict:
+    """
+    Outcome probabilities keyed like `get_counts()` bitstrings.
+
+    Outcomes below `threshold` are dropped, so wide registers with sparse
+    distributions stay small.
+    """
+    mapping = measured_qubits(circuit)
+    clbits = sorted(mapping)
+    unitary_part = circuit.remove_final_measurements(inplace=False)
+    unitary_part.save_probabilities([mapping[c] for c in clbits])
+    simulator = simulator or AerSimulator(method="statevector")
+    with span("simulate.exact") as s:
+        s.record_circuit(unitary_part)
+        probabilities = np.asarray(simulator.run(unitary_part).result().data()["probabilities"])
+
+    # Index bit k of the saved probabilities is the value of clbit clbits[k].
+    outcomes = np.flatnonzero(probabilities > threshold)
+    if clbits == list(range(len(clbits))):
+        keys = outcomes
+    else:
+        keys = np.zeros(len(outcomes), dtype=object)
+        for k, clbit in enumerate(clbits):
+            keys += ((outcomes >> k) & 1).astype(object) << clbit
+    width = circuit.num_clbits
+    return {format(int(key), f"0{width}b"): float(probabilities[i]) for key, i in zip(keys, outcomes)}
+
+def sample_counts(probabilities: dict, shots: int, seed=None) -> dict:
+    """Draw `shots` samples from an exact distribution, without simulation."""
+    rng = np.random.default_rng(seed)
+    keys = list(probabilities)
+    p = np.fromiter(probabilities.values(), dtype=float, count=len(keys))
+    counts = rng.multinomial(shots, p / p.sum())
+    return {key: int(n) for key, n in zip(keys, counts) if n}
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.circuit import ControlledGate, Gate, Instruction, ParameterExpression
+
+def _update_operation(hasher, op) -> None:
+    hasher.update(f"{op.name}|{op.num_qubits}|{op.num_clbits}|".encode())
+    for param in op.params:
+        if isinstance(param, np.ndarray):
+            hasher.update(np.ascontiguousarray(param).tobytes())
+        elif isinstance(param, ParameterExpression):
+            hasher.update(str(param).encode())
+        else:
+            hasher.update(repr(param).encode())
+    if type(op) is ControlledGate:
+        # Generic controlled gates (e.g. UnitaryGate(...).control(1)) are
+        # identified by their base gate, not by their synthesized definition.
+        hasher.update(f"ctrl{op.num_ctrl_qubits}:{op.ctrl_state}|".encode())
+        _update_operation(hasher, op.base_gate)
+    elif type(op) in (Gate, Instruction) and op.definition is not None:
+        # Custom composite gates (to_gate/to_instruction) share generic names,
+        # so their content has to be part of the hash.
+        _update_circuit(hasher, op.definition)
+
+def _update_circuit(hasher, circuit: QuantumCircuit) -> None:
+    hasher.update(f"{circuit.num_qubits}|{circuit.num_clbits}|{circuit.global_phase}|".encode())
+    for instruction in circuit.data:
+        _update_operation(hasher, instruction.operation)
+        qubits = [circuit.find_bit(q).index for q in instruction.qubits]
+        clbits = [circuit.find_bit(c).index for c in instruction.clbits]
+        hasher.update(f"{qubits}{clbits};".encode())
+
+def circuit_fingerprint(circuit: QuantumCircuit) -> str:
+    """
+    Content hash of a circuit that is stable across processes.
+
+    Circuit names and auto-generated gate names are ignored; operations,
+    parameters, matrices and qubit/clbit wiring are hashed.
+    """
+    hasher = hashlib.sha256()
+    _update_circuit(hasher, circuit)
+    return hasher.hexdigest()
+
+def backend_fingerprint(backend) -> str:
+    """
+    Hash of a backend's name, version and compilation target, including the
+    calibrated error and duration of every instruction and the qubits' T1/T2,
+    so noise-aware layouts are not reused after a recalibration.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(f"{backend.name}|{getattr(backend, 'backend_version', '')}|".encode())
+    target = getattr(backend, "target", None)
+    if target is not None:
+        hasher.update(f"{target.num_qubits}|{sorted(target.operation_names)}|".encode())
+        coupling_map = target.build_coupling_map()
+        if coupling_map is not None:
+            hasher.update(str(sorted(coupling_map.get_edges())).encode())
+        for name in sorted(target.operation_names):
+            for qargs, properties in sorted(target[name].items(), key=lambda item: str(item[0])):
+                if properties is not None:
+                    hasher.update(f"{name}{qargs}:{properties.duration}:{properties.error}|".encode())
+        for properties in target.qubit_properties or []:
+            if properties is not None:
+                hasher.update(f"{properties.t1}:{properties.t2}:{properties.frequency}|".encode())
+    return hasher.hexdigest()
+
+def noise_fingerprint(backend) -> str:
+    """Hash of an Aer backend's noise model, or "" when it simulates without noise."""
+    noise_model = getattr(getattr(backend, "options", None), "noise_model", None)
+    if noise_model is None:
+        return ""
+    noise = json.dumps(noise_model.to_dict(serializable=True), sort_keys=True, default=str)
+    return hashlib.sha256(noise.encode()).hexdigest()
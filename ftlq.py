@@ -0,0 +1,140 @@
+"""
+One entry point for every algorithm script.
+
+    python ftlq.py list
+    python ftlq.py run qpe --exact
+    python ftlq.py run grover --store
+    python ftlq.py run deutsch-jozsa --local fake_manila --trace
+    python ftlq.py run batch -- --local --max-circuits 2
+    python ftlq.py startup --budget 2.5
+
+Only the standard library is imported up front; an algorithm's module (and
+with it Qiskit, Aer, SciPy or qiskit-ibm-runtime) is loaded when it is run.
+Options map to the FTLQ_* environment variables the scripts already read,
+and the runtime service is only created by the scripts that need hardware,
+and only when --local is not given, so local runs work offline.
+
+`startup` measures cold-start time: how long a fresh interpreter takes to
+import each algorithm's module, and the CLI's own overhead. With --budget it
+exits with status 1 when any import exceeds that many seconds.
+"""
+import argparse
+import os
+import runpy
+import subprocess
+import sys
+import time
+
+# name -> (module, description, uses IBM hardware unless --local is given)
+ALGORITHMS = {
+    "superposition": ("superposition", "Hadamard superposition of one qubit", False),
+    "entanglement": ("entanglement", "Bell state on the simulator", False),
+    "noise": ("quantum_noise", "Bell state error rate on a device", True),
+    "deutsch-jozsa": ("deutsch-jozsa", "constant or balanced oracle", True),
+    "bernstein-vazirani": ("bernstein_vazirani", "hidden bit string", True),
+    "simon": ("simon", "hidden XOR period", True),
+    "grover": ("search_algorithm", "Grover search over 5 qubits", False),
+    "qpe": ("qpe", "quantum phase estimation", False),
+    "shor": ("shor", "period finding and factoring", False),
+    "vqe": ("vqe", "ground state energy of an Ising Hamiltonian", False),
+    "batch": ("batch_runner", "all runtime examples as one Sampler batch", True),
+}
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _environment(args) -> dict:
+    """FTLQ_* variables for the options given on the command line."""
+    env = {}
+    if args.local is not None:
+        env["FTLQ_LOCAL"] = args.local
+    for flag, name in (("exact", "FTLQ_EXACT"), ("adaptive", "FTLQ_ADAPTIVE"), ("plot", "FTLQ_PLOT")):
+        if getattr(args, flag):
+            env[name] = "1"
+    if args.trace is not None:
+        env["FTLQ_TRACE"] = args.trace
+    if args.store is not None:
+        env["FTLQ_STORE"] = args.store
+    return env
+
+def run(args, script_args: list) -> None:
+    module, _, _ = ALGORITHMS[args.algorithm]
+    # Set before the module is imported: tracing, for one, reads FTLQ_TRACE at import.
+    os.environ.update(_environment(args))
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    sys.argv = [os.path.join(REPO_DIR, f"{module}.py"), *script_args]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+def import_seconds(module: str, repeat: int = 3) -> float:
+    """Best wall time over `repeat` fresh interpreters that only import `module`."""
+    code = f"import importlib, sys; sys.path.insert(0, {REPO_DIR!r}); importlib.import_module({module!r})"
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-W", "ignore", "-c", code], check=True, cwd=REPO_DIR)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def startup(args) -> int:
+    names = args.algorithms or list(ALGORITHMS)
+    baseline = import_seconds("os", args.repeat)
+    cli = min(_time_command([sys.executable, os.path.abspath(__file__), "list"]) for _ in range(args.repeat))
+    print(f"{'interpreter':<20} {baseline:>7.3f} s")
+    print(f"{'ftlq.py list':<20} {cli:>7.3f} s")
+    over_budget = []
+    for name in names:
+        seconds = import_seconds(ALGORITHMS[name][0], args.repeat)
+        flag = ""
+        if args.budget is not None and seconds > args.budget:
+            over_budget.append(name)
+            flag = f"  over the {args.budget:g} s budget"
+        print(f"{name:<20} {seconds:>7.3f} s{flag}")
+    return 1 if over_budget else 0
+
+def _time_command(command: list) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=REPO_DIR)
+    return time.perf_counter() - start
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="list the algorithms")
+
+    run_parser = subparsers.add_parser("run", help="run an algorithm script (its own arguments go after --)")
+    run_parser.add_argument("algorithm", choices=sorted(ALGORITHMS))
+    run_parser.add_argument("--local", nargs="?", const="1", default=None, metavar="DEVICE",
+                            help="emulate the device offline instead of using IBM hardware (FTLQ_LOCAL)")
+    run_parser.add_argument("--exact", action="store_true", help="exact distributions instead of shots (FTLQ_EXACT)")
+    run_parser.add_argument("--adaptive", action="store_true", help="stop sampling once decided (FTLQ_ADAPTIVE)")
+    run_parser.add_argument("--plot", action="store_true", help="render diagrams and histograms (FTLQ_PLOT)")
+    run_parser.add_argument("--trace", nargs="?", const="1", default=None, metavar="PATH",
+                            help="write a Chrome trace of the run (FTLQ_TRACE)")
+    run_parser.add_argument("--store", nargs="?", const="1", default=None, metavar="PATH",
+                            help="reuse and keep counts in the result store (FTLQ_STORE)")
+
+    startup_parser = subparsers.add_parser("startup", help="measure cold-start import times")
+    startup_parser.add_argument("algorithms", nargs="*", help="algorithms to measure (default: all)")
+    startup_parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement; the best is kept")
+    startup_parser.add_argument("--budget", type=float, default=None, help="fail if an import takes longer (seconds)")
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Everything after "--" is passed on to the script.
+    split = argv.index("--") if "--" in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    unknown = set(getattr(args, "algorithms", [])) - set(ALGORITHMS)
+    if unknown:
+        parser.error(f"unknown algorithms: {', '.join(sorted(unknown))}")
+    if args.command == "list":
+        width = max(map(len, ALGORITHMS))
+        for name, (_, description, hardware) in ALGORITHMS.items():
+            print(f"{name:<{width}}  {description}{' (IBM hardware unless --local)' if hardware else ''}")
+    elif args.command == "run":
+        run(args, argv[split + 1:])
+    else:
+        return startup(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
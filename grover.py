@@ -0,0 +1,151 @@
+"""
+Grover search with cached oracle and diffuser gates.
+
+The multi-controlled X (per number of controls and ancilla mode), the
+diffuser and every phase oracle are synthesized once and reused as gates,
+so building a circuit only appends the same Grover iterate k times. For
+simulators without a coupling map, `transpiled_grover` transpiles that
+iterate once and repeats the transpiled body, so transpilation time no
+longer grows with the iteration count.
+
+Bitstrings use Qiskit order: the rightmost character is qubit 0.
+"""
+import math
+from functools import lru_cache
+from qiskit import QuantumCircuit, transpile
+from qiskit.circuit.library import MCXGate
+from transpile_cache import cached_transpile
+
+def num_ancillas(num_qubits: int, mode: str = "noancilla") -> int:
+    """Ancilla qubits the oracle and diffuser need on `num_qubits` search qubits."""
+    return MCXGate.get_num_ancilla_qubits(num_qubits - 1, mode)
+
+@lru_cache(maxsize=None)
+def mcx_gate(num_controls: int, mode: str = "noancilla"):
+    """
+    Multi-controlled X on controls, target, then ancillas, decomposed to
+    u/cx once per (num_controls, mode).
+    """
+    ancillas = MCXGate.get_num_ancilla_qubits(num_controls, mode)
+    qc = QuantumCircuit(num_controls + 1 + ancillas, name=f"mcx_{mode}")
+    qc.mcx(list(range(num_controls)), num_controls,
+           list(range(num_controls + 1, num_controls + 1 + ancillas)) or None, mode=mode)
+    return transpile(qc, basis_gates=["u", "cx"], optimization_level=1).to_gate(label=f"mcx_{mode}")
+
+def _mcz(qc: QuantumCircuit, num_qubits: int, mode: str) -> None:
+    """Phase flip of |1...1> on the search qubits, as H-MCX-H on the top qubit."""
+    target = num_qubits - 1
+    ancillas = list(range(num_qubits, num_qubits + num_ancillas(num_qubits, mode)))
+    qc.h(target)
+    if num_qubits == 1:
+        qc.x(target)
+    else:
+        qc.append(mcx_gate(num_qubits - 1, mode), list(range(num_qubits - 1)) + [target] + ancillas)
+    qc.h(target)
+
+@lru_cache(maxsize=None)
+def diffuser_gate(num_qubits: int, mode: str = "noancilla"):
+    """Inversion about the mean on `num_qubits` qubits (plus ancillas)."""
+    qc = QuantumCircuit(num_qubits + num_ancillas(num_qubits, mode), name="Diffuser")
+    qc.h(range(num_qubits))
+    qc.x(range(num_qubits))
+    _mcz(qc, num_qubits, mode)
+    qc.x(range(num_qubits))
+    qc.h(range(num_qubits))
+    return qc.to_gate(label="Diffuser")
+
+def marked_states(num_qubits: int, predicate) -> frozenset:
+    """The bitstrings of `num_qubits` bits for which `predicate(bitstring)` is true."""
+    return frozenset(
+        bits for bits in (format(i, f"0{num_qubits}b") for i in range(2 ** num_qubits)) if predicate(bits)
+    )
+
+def phase_oracle(num_qubits: int, marked, mode: str = "noancilla"):
+    """
+    Phase oracle flipping the sign of the marked states, given as an
+    iterable of bitstrings or a predicate on bitstrings.
+    """
+    if callable(marked):
+        marked = marked_states(num_qubits, marked)
+    return _phase_oracle(num_qubits, frozenset(marked), mode)
+
+@lru_cache(maxsize=None)
+def _phase_oracle(num_qubits: int, marked: frozenset, mode: str):
+    if any(len(bits) != num_qubits for bits in marked):
+        raise ValueError(f"Marked states must be {num_qubits}-bit strings")
+    qc = QuantumCircuit(num_qubits + num_ancillas(num_qubits, mode), name="Oracle")
+    # Each state is flipped by X on its zero bits around an MCZ. Visiting the
+    # states in sorted order, only the bits that differ from the previous
+    # state's X mask are toggled.
+    flipped = 0
+    for bits in sorted(marked):
+        zeros = ~int(bits, 2) & (2 ** num_qubits - 1)
+        toggle = zeros ^ flipped
+        if toggle:
+            qc.x([q for q in range(num_qubits) if toggle >> q & 1])
+        flipped = zeros
+        _mcz(qc, num_qubits, mode)
+    if flipped:
+        qc.x([q for q in range(num_qubits) if flipped >> q & 1])
+    return qc.to_gate(label="Oracle")
+
+def optimal_iterations(num_qubits: int, num_marked: int) -> int:
+    """Iterations maximizing the success probability for `num_marked` of 2^n states."""
+    if num_marked <= 0:
+        raise ValueError("At least one state must be marked")
+    theta = math.asin(math.sqrt(min(1.0, num_marked / 2 ** num_qubits)))
+    return max(0, round(math.pi / (4 * theta) - 0.5))
+
+def grover_iterate(num_qubits: int, oracle, mode: str = "noancilla") -> QuantumCircuit:
+    """One Grover iteration: the oracle (a gate or circuit) then the diffuser."""
+    qc = QuantumCircuit(num_qubits + num_ancillas(num_qubits, mode), name="Grover")
+    qc.append(oracle if not isinstance(oracle, QuantumCircuit) else oracle.to_gate(), range(oracle.num_qubits))
+    qc.append(diffuser_gate(num_qubits, mode), range(qc.num_qubits))
+    return qc
+
+def grover_circuit(num_qubits: int, marked, iterations: int | None = None,
+                   mode: str = "noancilla") -> QuantumCircuit:
+    """
+    Grover search for the marked states (bitstrings or a predicate),
+    measuring the search qubits. By default the optimal iteration count
+    for the number of marked states is used.
+    """
+    if callable(marked):
+        marked = marked_states(num_qubits, marked)
+    marked = frozenset(marked)
+    if iterations is None:
+        iterations = optimal_iterations(num_qubits, len(marked))
+    iterate = grover_iterate(num_qubits, phase_oracle(num_qubits, marked, mode), mode).to_gate()
+    qc = QuantumCircuit(num_qubits + num_ancillas(num_qubits, mode), num_qubits)
+    qc.h(range(num_qubits))
+    for _ in range(iterations):
+        qc.append(iterate, range(qc.num_qubits))
+    qc.measure(range(num_qubits), range(num_qubits))
+    return qc
+
+def transpiled_grover(num_qubits: int, marked, backend, iterations: int | None = None,
+                      mode: str = "noancilla") -> QuantumCircuit:
+    """
+    Grover circuit ready to run on `backend`, transpiling the iterate once.
+
+    Only backends without a coupling map (simulators) can reuse the iterate,
+    since routing on a device may permute qubits differently each time;
+    other backends transpile the full circuit.
+    """
+    if callable(marked):
+        marked = marked_states(num_qubits, marked)
+    marked = frozenset(marked)
+    if iterations is None:
+        iterations = optimal_iterations(num_qubits, len(marked))
+    if backend.target.build_coupling_map() is not None:
+        return cached_transpile(grover_circuit(num_qubits, marked, iterations, mode), backend)
+
+    iterate = grover_iterate(num_qubits, phase_oracle(num_qubits, marked, mode), mode)
+    body = cached_transpile(iterate, backend)
+    prep = QuantumCircuit(iterate.num_qubits, num_qubits)
+    prep.h(range(num_qubits))
+    qc = cached_transpile(prep, backend)
+    for _ in range(iterations):
+        qc.compose(body, inplace=True)
+    qc.measure(range(num_qubits), range(num_qubits))
+    return qc
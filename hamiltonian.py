@@ -0,0 +1,84 @@
+import numpy as np
+
+class IsingHamiltonian:
+    """
+    Diagonal Hamiltonian made of Pauli-Z strings, e.g. H = Z0 + Z1 + Z0*Z1.
+
+    Terms are (label, coefficient) pairs where the label uses Qiskit's
+    ordering: the rightmost character acts on qubit 0, so "ZI" is Z on qubit 1.
+    Only 'Z' and 'I' are allowed. The diagonal of H in the computational basis
+    is computed once, after which every energy is a single dot product.
+    """
+
+    def __init__(self, terms):
+        self.terms = [(label.upper(), float(coeff)) for label, coeff in terms]
+        if not self.terms:
+            raise ValueError("Hamiltonian needs at least one term")
+        self.num_qubits = len(self.terms[0][0])
+        for label, _ in self.terms:
+            if len(label) != self.num_qubits or set(label) - {"Z", "I"}:
+                raise ValueError(f"Invalid Z-string term: {label!r}")
+        self._diagonal = None
+
+    @classmethod
+    def from_dict(cls, terms: dict) -> "IsingHamiltonian":
+        return cls(terms.items())
+
+    @classmethod
+    def chain(cls, fields, couplings) -> "IsingHamiltonian":
+        """
+        Open Ising chain H = sum_i h_i Z_i + sum_i J_i Z_i Z_(i+1), with
+        `fields` h (one per qubit) and `couplings` J (one per neighbour pair).
+        """
+        n = len(fields)
+        if len(couplings) != n - 1:
+            raise ValueError(f"A chain of {n} qubits needs {n - 1} couplings")
+        def label(*qubits):
+            return "".join("Z" if q in qubits else "I" for q in reversed(range(n)))
+        terms = [(label(i), h) for i, h in enumerate(fields)]
+        terms += [(label(i, i + 1), J) for i, J in enumerate(couplings)]
+        return cls(terms)
+
+    @property
+    def coefficients(self) -> dict:
+        """{label: coefficient}, with repeated labels summed."""
+        coefficients = {}
+        for label, coeff in self.terms:
+            coefficients[label] = coefficients.get(label, 0.0) + coeff
+        return coefficients
+
+    @property
+    def diagonal(self) -> np.ndarray:
+        """Eigenvalue of H for every computational basis state (length 2^n)."""
+        if self._diagonal is None:
+            index = np.arange(2 ** self.num_qubits, dtype=np.uint64)
+            diagonal = np.zeros(2 ** self.num_qubits)
+            for label, coeff in self.terms:
+                mask = np.uint64(int(label.replace("Z", "1").replace("I", "0"), 2))
+                parity = np.bitwise_count(index & mask) & 1
+                # Z eigenvalue is +1 for even parity and -1 for odd parity.
+                diagonal += coeff * (1.0 - 2.0 * parity)
+            self._diagonal = diagonal
+        return self._diagonal
+
+    def energy(self, bitstring: str) -> float:
+        """Eigenvalue of a single basis state given as a Qiskit bitstring."""
+        return float(self.diagonal[int(bitstring, 2)])
+
+    def expectation(self, states) -> np.ndarray | float:
+        """
+        <H> for one statevector (shape (2^n,)) or a batch (shape (k, 2^n)).
+        """
+        states = np.asarray(states)
+        probabilities = np.abs(states) ** 2
+        energies = probabilities @ self.diagonal
+        return float(energies) if energies.ndim == 0 else energies
+
+    def expectation_from_counts(self, counts: dict) -> float:
+        """<H> estimated from a counts (or quasi-probability) dictionary."""
+        outcomes = np.fromiter((int(k.replace(" ", ""), 2) for k in counts), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=float, count=len(counts))
+        return float(weights @ self.diagonal[outcomes] / weights.sum())
+
+    def ground_state_energy(self) -> float:
+        return float(self.diagonal.min())
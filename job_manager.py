@@ -0,0 +1,275 @@
+"""
+Asynchronous submission and retrieval of Sampler jobs.
+
+Every job is submitted right away, its ID is appended to a journal file, and
+all jobs are then polled concurrently with exponential backoff. Each result is
+handed to its post-processing callback as soon as it arrives, rather than
+waiting on the jobs one after another.
+
+If the process dies, running it again with the same journal re-attaches to
+the recorded jobs through `service.job(job_id)` instead of resubmitting them.
+Finished and failed jobs are journaled too, and only a job whose last entry
+is "submitted" is re-attached: a job that ended in ERROR or CANCELLED is
+submitted again. The journal is shared by every batch and only appended to.
+
+LocalQueueService is a stand-in for QiskitRuntimeService. It runs jobs on a
+local simulator but holds them in a queue for a random time, so the manager
+can be exercised offline. With a `state_dir`, queued jobs are saved to disk
+and a fresh service in another process can look them up by ID.
+
+    python job_manager.py    # crash a batch after submission, then resume it
+"""
+import asyncio
+import inspect
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable
+from tracing import count, span
+
+DEFAULT_JOURNAL = os.path.join(os.environ.get("FTLQ_CACHE_DIR", ".cache"), "jobs.jsonl")
+FINAL_STATUSES = {"DONE", "ERROR", "CANCELLED"}
+
+@dataclass
+class JobSpec:
+    name: str
+    pubs: list
+    callback: Callable | None = None
+
+def _status_name(status) -> str:
+    # Runtime jobs report strings, local primitive jobs a JobStatus enum.
+    return str(getattr(status, "name", status)).upper()
+
+def load_journal(path: str) -> dict:
+    """{name: last journal entry} from a journal file, empty if there is none."""
+    entries = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["name"]] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+class JobManager:
+    """
+    Submits JobSpecs through `sampler.run(pubs)` and collects their results.
+
+    `service` is only needed to re-attach to journaled jobs after a restart;
+    without a journal path (e.g. for local simulators) nothing is recorded.
+    """
+
+    def __init__(self, sampler, service=None, journal_path: str | None = DEFAULT_JOURNAL,
+                 poll_interval: float = 1.0, max_interval: float = 30.0, backoff: float = 2.0):
+        self.sampler = sampler
+        self.service = service
+        self.journal_path = journal_path
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.submitted = 0
+        self.resumed = 0
+
+    def _record(self, **entry) -> None:
+        if not self.journal_path:
+            return
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps({**entry, "time": time.time()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def submit(self, spec: JobSpec):
+        """Submit `spec`, or re-attach to the job the journal recorded for it."""
+        entry = load_journal(self.journal_path).get(spec.name) if self.journal_path else None
+        # Finished or failed jobs are not re-attached; a failed one is run again.
+        if entry and entry["event"] == "submitted" and self.service is not None:
+            self.resumed += 1
+            count("jobs.resumed")
+            return await asyncio.to_thread(self.service.job, entry["job_id"])
+        with span("job.submit", track=spec.name):
+            job = await asyncio.to_thread(self.sampler.run, spec.pubs)
+        self.submitted += 1
+        count("jobs.submitted")
+        self._record(event="submitted", name=spec.name, job_id=job.job_id())
+        return job
+
+    async def wait(self, spec: JobSpec, job):
+        """Poll `job` with backoff, then run the callback on its result."""
+        interval = self.poll_interval
+        # Each job gets its own timeline, since the waits overlap.
+        with span("job.wait", track=spec.name, job_id=job.job_id()) as s:
+            polls = 1
+            while (status := _status_name(await asyncio.to_thread(job.status))) not in FINAL_STATUSES:
+                await asyncio.sleep(interval)
+                interval = min(interval * self.backoff, self.max_interval)
+                polls += 1
+            s.set(polls=polls, status=status)
+        if status != "DONE":
+            self._record(event="failed", name=spec.name, job_id=job.job_id(), status=status)
+            raise RuntimeError(f"Job {spec.name} ({job.job_id()}) ended with status {status}")
+        with span("job.result", track=spec.name):
+            result = await asyncio.to_thread(job.result)
+        if spec.callback is not None:
+            with span("job.callback", track=spec.name):
+                outcome = spec.callback(spec.name, result)
+                if inspect.isawaitable(outcome):
+                    await outcome
+        self._record(event="done", name=spec.name, job_id=job.job_id())
+        return result
+
+    async def run(self, specs: list[JobSpec]) -> dict:
+        """Submit all specs, then wait for all of them; returns {name: result}."""
+        if len({spec.name for spec in specs}) != len(specs):
+            raise ValueError("Job names must be unique")
+        jobs = await asyncio.gather(*(self.submit(spec) for spec in specs))
+        results = await asyncio.gather(*(self.wait(spec, job) for spec, job in zip(specs, jobs)))
+        return {spec.name: result for spec, result in zip(specs, results)}
+
+def run_jobs(specs: list[JobSpec], sampler, service=None, journal_path: str | None = DEFAULT_JOURNAL,
+             **options) -> dict:
+    """Blocking wrapper around JobManager.run for synchronous scripts."""
+    return asyncio.run(JobManager(sampler, service, journal_path, **options).run(specs))
+
+class _QueuedJob:
+    def __init__(self, inner, job_id: str, ready_at: float):
+        self._inner = inner
+        self._job_id = job_id
+        self._ready_at = ready_at
+
+    def job_id(self) -> str:
+        return self._job_id
+
+    def status(self) -> str:
+        if time.time() < self._ready_at:
+            return "QUEUED"
+        return _status_name(self._inner.status())
+
+    def result(self):
+        time.sleep(max(0.0, self._ready_at - time.time()))
+        return self._inner.result()
+
+class LocalQueueService:
+    """
+    Stand-in for QiskitRuntimeService and its Sampler: jobs run on a local
+    backend (an AerSimulator by default) and stay queued for a random time
+    drawn from `latency` seconds.
+
+    With `state_dir`, each job's PUBs and queue deadline are written there
+    (QPY and JSON), so `job(job_id)` on a new service, e.g. after a crash,
+    finds jobs another process submitted. Such a job is executed again
+    locally, as if it had kept running on the server.
+    """
+
+    def __init__(self, backend=None, latency: tuple[float, float] = (0.5, 2.0), seed: int | None = None,
+                 state_dir: str | None = None):
+        from qiskit_ibm_runtime import SamplerV2
+        if backend is None:
+            from qiskit_aer import AerSimulator
+            backend = AerSimulator()
+        self.backend = backend
+        self.latency = latency
+        self.state_dir = state_dir
+        self.submitted = 0
+        self._sampler = SamplerV2(mode=backend)
+        self._rng = random.Random(seed)
+        self._jobs = {}
+
+    def run(self, pubs, shots: int | None = None):
+        self.submitted += 1
+        job_id, ready_at = uuid.uuid4().hex, time.time() + self._rng.uniform(*self.latency)
+        if self.state_dir:
+            self._save(job_id, pubs, shots, ready_at)
+        self._jobs[job_id] = _QueuedJob(self._sampler.run(pubs, shots=shots), job_id, ready_at)
+        return self._jobs[job_id]
+
+    def job(self, job_id: str):
+        if job_id not in self._jobs:
+            self._jobs[job_id] = self._load(job_id)
+        return self._jobs[job_id]
+
+    def _save(self, job_id: str, pubs, shots: int | None, ready_at: float) -> None:
+        from qiskit import qpy
+        os.makedirs(self.state_dir, exist_ok=True)
+        pubs = [tuple(pub) + (None,) * (3 - len(pub)) for pub in pubs]
+        with open(os.path.join(self.state_dir, f"{job_id}.qpy"), "wb") as f:
+            qpy.dump([circuit for circuit, _, _ in pubs], f)
+        state = {"ready_at": ready_at, "shots": shots,
+                 "pubs": [(values.tolist() if hasattr(values, "tolist") else values, pub_shots)
+                          for _, values, pub_shots in pubs]}
+        # The JSON is written last and atomically: it marks the job as complete on disk.
+        tmp_path = os.path.join(self.state_dir, f"{job_id}.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, os.path.join(self.state_dir, f"{job_id}.json"))
+
+    def _load(self, job_id: str) -> _QueuedJob:
+        from qiskit import qpy
+        if not self.state_dir or not os.path.exists(os.path.join(self.state_dir, f"{job_id}.json")):
+            raise KeyError(f"Unknown job {job_id}")
+        with open(os.path.join(self.state_dir, f"{job_id}.json")) as f:
+            state = json.load(f)
+        with open(os.path.join(self.state_dir, f"{job_id}.qpy"), "rb") as f:
+            circuits = qpy.load(f)
+        pubs = [(circuit, values, pub_shots) for circuit, (values, pub_shots) in zip(circuits, state["pubs"])]
+        return _QueuedJob(self._sampler.run(pubs, shots=state["shots"]), job_id, state["ready_at"])
+
+def _check_specs() -> list[JobSpec]:
+    from entanglement import bell_circuit
+    from superposition import superposition_circuit
+    return [JobSpec("bell", [(bell_circuit(), None, 200)]),
+            JobSpec("superposition", [(superposition_circuit(), None, 200)])]
+
+def _check_submit_and_hang(state_dir: str, journal_path: str) -> None:
+    """Child process of check_resume(): runs the batch until it is killed."""
+    service = LocalQueueService(latency=(3.0, 3.0), state_dir=state_dir)
+    run_jobs(_check_specs(), service, service, journal_path, poll_interval=0.1)
+
+def check_resume(timeout: float = 60.0) -> None:
+    """
+    Kill a batch once its jobs are submitted, record one of them as failed,
+    and resume the batch in this process: the other job must be re-attached
+    without resubmitting, the failed one submitted again, and the journal
+    entries of another batch kept.
+    """
+    names = [spec.name for spec in _check_specs()]
+    with tempfile.TemporaryDirectory() as tmp:
+        state_dir, journal_path = os.path.join(tmp, "jobs"), os.path.join(tmp, "jobs.jsonl")
+        with open(journal_path, "w") as f:
+            f.write(json.dumps({"event": "submitted", "name": "other-batch", "job_id": "x"}) + "\n")
+        code = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); "
+                f"import job_manager; job_manager._check_submit_and_hang({state_dir!r}, {journal_path!r})")
+        child = subprocess.Popen([sys.executable, "-W", "ignore", "-c", code])
+        deadline = time.time() + timeout
+        while not all(name in load_journal(journal_path) for name in names):
+            if time.time() > deadline or child.poll() is not None:
+                child.kill()
+                raise RuntimeError("The batch was not submitted")
+            time.sleep(0.05)
+        child.send_signal(signal.SIGKILL)
+        child.wait()
+        print(f"Killed the batch after it submitted {len(names)} jobs")
+
+        service = LocalQueueService(latency=(0.1, 0.2), state_dir=state_dir)
+        manager = JobManager(service, service, journal_path, poll_interval=0.1)
+        failed = load_journal(journal_path)[names[0]]
+        manager._record(event="failed", name=names[0], job_id=failed["job_id"], status="ERROR")
+        results = asyncio.run(manager.run(_check_specs()))
+        assert (manager.resumed, manager.submitted, service.submitted) == (1, 1, 1), \
+            (manager.resumed, manager.submitted, service.submitted)
+        assert all(result[0].join_data().num_shots == 200 for result in results.values())
+        assert load_journal(journal_path)["other-batch"]["event"] == "submitted"
+        print(f"Resumed {names[1]!r} without resubmitting it, resubmitted the failed {names[0]!r}, "
+              "kept the other batch's journal entry")
+
+if __name__ == "__main__":
+    check_resume()
@@ -1,5 +1,6 @@
 from qiskit_ibm_runtime import QiskitRuntimeService
 from qiskit_aer import Aer
+from backend_select import backend_infos
 
 # Initialize the runtime service (automatically loads saved account)
 service = QiskitRuntimeService()
@@ -9,10 +10,7 @@ print("Local Quantum Simulators:")
 for simulator in Aer.backends():
     print(f"	{simulator}")
 
-# List available quantum computers
+# List available quantum computers (configurations are cached, statuses polled concurrently)
 print("\nAvailable Quantum Computers:")
-for backend in service.backends():
-    config = backend.configuration()
-    if not config.simulator:
-        status = backend.status()
-        print(f"	{backend.name}, Number of Qubits: {config.n_qubits}, Queue length: {status.pending_jobs}")
+for info in backend_infos(service, simulator=False):
+    print(f"	{info.name}, Number of Qubits: {info.num_qubits}, Queue length: {info.pending_jobs}")
@@ -0,0 +1,127 @@
+"""
+Offline emulation of IBM devices with Aer noise models.
+
+A device is emulated from a calibration snapshot saved earlier from the
+live backend (`python noise_emulator.py snapshot ibm_brisbane`), or else
+from the fake backend bundled with qiskit-ibm-runtime (e.g. fake_manila).
+The returned AerSimulator has the device's target, so circuits are
+transpiled exactly as for the hardware run. It also works as a Session
+backend for the runtime Sampler.
+
+Small circuits are simulated as a density matrix (exact noisy
+distribution). Wider ones use noisy statevector trajectories, with shots
+spread across all cores.
+
+Scripts run locally when FTLQ_LOCAL is set: "1" emulates DEFAULT_DEVICE, any
+other value names the device.
+"""
+import argparse
+import json
+import os
+import time
+from qiskit_aer import AerSimulator
+from qiskit_aer.noise import NoiseModel
+from tracing import span
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.environ.get("FTLQ_CACHE_DIR", ".cache"), "calibrations")
+DEFAULT_DEVICE = "fake_guadalupe"
+# Up to this many qubits the density-matrix method is used in "auto" mode.
+DENSITY_MATRIX_MAX_QUBITS = 12
+
+def local_device() -> str | None:
+    value = os.environ.get("FTLQ_LOCAL", "")
+    if not value:
+        return None
+    return DEFAULT_DEVICE if value == "1" else value
+
+def _snapshot_path(name: str, snapshot_dir: str) -> str:
+    return os.path.join(snapshot_dir, f"{name}.json")
+
+def save_snapshot(backend, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> str:
+    """Save the backend's configuration and current calibration data as JSON."""
+    snapshot = {
+        "name": backend.name,
+        "saved_at": time.time(),
+        "configuration": backend.configuration().to_dict(),
+        "properties": backend.properties().to_dict(),
+    }
+    path = _snapshot_path(backend.name, snapshot_dir)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+def load_snapshot(name: str, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> dict | None:
+    try:
+        with open(_snapshot_path(name, snapshot_dir)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def fake_backend(name: str):
+    """The bundled fake backend called `name` ("fake_manila" or "manila"), or None."""
+    from qiskit_ibm_runtime.fake_provider import FakeProviderForBackendV2
+    wanted = name if name.startswith("fake_") else f"fake_{name}"
+    for backend in FakeProviderForBackendV2().backends():
+        if backend.name == wanted:
+            return backend
+    return None
+
+def _aer_method(method: str, num_qubits: int | None) -> str:
+    if method == "auto":
+        small = num_qubits is not None and num_qubits <= DENSITY_MATRIX_MAX_QUBITS
+        method = "density_matrix" if small else "trajectory"
+    if method == "trajectory":
+        return "statevector"
+    if method != "density_matrix":
+        raise ValueError(f"Unknown noise simulation method: {method}")
+    return method
+
+def noisy_simulator(device: str = DEFAULT_DEVICE, method: str = "auto", num_qubits: int | None = None,
+                    snapshot_dir: str = DEFAULT_SNAPSHOT_DIR, threads: int = 0) -> AerSimulator:
+    """
+    AerSimulator emulating `device`, preferring a saved calibration snapshot
+    over the bundled fake backend.
+
+    `method` is "density_matrix", "trajectory" or "auto" (density matrix up
+    to DENSITY_MATRIX_MAX_QUBITS logical qubits). `threads=0` uses all cores.
+    """
+    options = {
+        "method": _aer_method(method, num_qubits),
+        "max_parallel_threads": threads,
+        "max_parallel_shots": threads,
+    }
+    with span("noise_model", device=device, method=options["method"]):
+        snapshot = load_snapshot(device, snapshot_dir)
+        if snapshot is not None:
+            from qiskit_ibm_runtime.models import BackendConfiguration, BackendProperties
+            from qiskit_ibm_runtime.utils.backend_converter import convert_to_target
+            properties = BackendProperties.from_dict(snapshot["properties"])
+            configuration = BackendConfiguration.from_dict(snapshot["configuration"])
+            return AerSimulator(target=convert_to_target(configuration, properties),
+                                noise_model=NoiseModel.from_backend_properties(properties), **options)
+        backend = fake_backend(device)
+        if backend is None:
+            raise ValueError(f"No calibration snapshot or fake backend named {device!r}")
+        return AerSimulator.from_backend(backend, **options)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage calibration snapshots for offline noise emulation")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    snapshot_parser = subparsers.add_parser("snapshot", help="save calibration data of IBM backends")
+    snapshot_parser.add_argument("backends", nargs="+")
+    subparsers.add_parser("list", help="list saved snapshots")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        service = QiskitRuntimeService()
+        for name in args.backends:
+            print(f"Saved {save_snapshot(service.backend(name))}")
+    elif os.path.isdir(DEFAULT_SNAPSHOT_DIR):
+        for filename in sorted(os.listdir(DEFAULT_SNAPSHOT_DIR)):
+            if filename.endswith(".json"):
+                saved_at = load_snapshot(filename[:-5])["saved_at"]
+                print(f"{filename[:-5]}: saved {time.strftime('%Y-%m-%d %H:%M', time.localtime(saved_at))}")
@@ -0,0 +1,93 @@
+"""
+Opt-in, off-hot-path rendering of circuit diagrams and histograms.
+
+Plotting is disabled unless FTLQ_PLOT=1, and matplotlib is only imported by
+the render workers, so headless and batch runs never load it. When enabled,
+requests are queued while the script runs and rendered in a background
+process pool when the script calls render() after printing its results.
+A circuit diagram is skipped when the image on disk was drawn from a
+circuit with the same content hash (stored next to it in a .sha256 file).
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tracing import add_event, span
+
+_pending = []
+
+def plots_enabled() -> bool:
+    return os.environ.get("FTLQ_PLOT") == "1"
+
+def _hash_path(filename: str) -> str:
+    return f"{filename}.sha256"
+
+def _draw_circuit(circuit, filename: str) -> str:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    circuit.draw('mpl', filename=filename)
+    plt.close("all")
+    return filename
+
+def _draw_histogram(probabilities: dict, filename: str, title: str | None, ylabel: str | None) -> str:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from qiskit.visualization import plot_histogram
+    fig = plot_histogram(probabilities, title=title)
+    if ylabel:
+        fig.get_axes()[0].set_ylabel(ylabel)
+    fig.savefig(filename, bbox_inches="tight")
+    plt.close(fig)
+    return filename
+
+def _timed(fn, *args) -> tuple:
+    """Run a render job in a worker and report when it ran, for tracing."""
+    start = time.perf_counter_ns() / 1000
+    result = fn(*args)
+    return result, os.getpid(), start, time.perf_counter_ns() / 1000 - start
+
+def save_circuit_diagram(circuit, filename: str) -> None:
+    """Queue a circuit diagram, unless an image of the same circuit exists."""
+    if not plots_enabled():
+        return
+    from fingerprint import circuit_fingerprint
+    digest = circuit_fingerprint(circuit)
+    try:
+        with open(_hash_path(filename)) as f:
+            if f.read().strip() == digest and os.path.exists(filename):
+                print(f"Circuit diagram '{filename}' is up to date")
+                return
+    except FileNotFoundError:
+        pass
+    _pending.append((_draw_circuit, (circuit, filename), digest))
+
+def save_histogram(probabilities, filename: str, title: str | None = None, ylabel: str | None = None) -> None:
+    """Queue a histogram of measurement probabilities (a dict, or SparseCounts to normalize)."""
+    if not plots_enabled():
+        return
+    from counts import SparseCounts
+    if isinstance(probabilities, SparseCounts):
+        probabilities = probabilities.probabilities_dict()
+    _pending.append((_draw_histogram, (probabilities, filename, title, ylabel), None))
+
+def render(max_workers: int | None = None) -> None:
+    """Render everything queued so far, in parallel worker processes."""
+    if not _pending:
+        return
+    jobs, _pending[:] = list(_pending), []
+    for _, args, _ in jobs:
+        os.makedirs(os.path.dirname(args[1]) or ".", exist_ok=True)
+    workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    with span("render", plots=len(jobs), workers=workers), \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(_timed, fn, *args): digest for fn, args, digest in jobs}
+        for future in as_completed(futures):
+            filename, pid, start, duration = future.result()
+            # perf_counter reads the system-wide monotonic clock, so worker times line up.
+            add_event("plot", start, duration, track=f"render worker {pid}", filename=filename)
+            if futures[future] is not None:
+                with open(_hash_path(filename), "w") as f:
+                    f.write(futures[future])
+            print(f"Saved '{filename}'")
@@ -1,20 +1,90 @@
-import os
-from qiskit import QuantumCircuit, transpile
+import hashlib
+from functools import lru_cache
+from qiskit import QuantumCircuit
 from qiskit_aer import Aer
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
 import numpy as np
-from qiskit.circuit.library import UnitaryGate, QFT
+from qiskit.circuit.library import CPhaseGate, DiagonalGate, UnitaryGate, QFT
+from transpile_cache import cached_transpile
+from exact import exact_mode, exact_probabilities
+from plotting import render, save_circuit_diagram, save_histogram
+from result_store import run_counts
 
-def controlled_unitary_gate(unitary: UnitaryGate, exponent: int) -> QuantumCircuit:
+# Synthesized controlled powers kept at once; a sweep over phi adds one set per phase.
+CONTROLLED_POWER_CACHE_SIZE = 256
+
+class _Matrix:
+    """A unitary, hashed and compared by content, so it can key an lru_cache."""
+    __slots__ = ("digest", "matrix", "power")
+
+    def __init__(self, matrix: np.ndarray, power: np.ndarray | None = None):
+        self.matrix = matrix
+        # A power the caller already computed; only used on a cache miss.
+        self.power = power
+        self.digest = hashlib.sha256(np.ascontiguousarray(matrix, dtype=complex).tobytes()).hexdigest()
+
+    def __hash__(self) -> int:
+        return hash(self.digest)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _Matrix) and self.digest == other.digest
+
+def _controlled_diagonal_gate(diagonal: np.ndarray, exponent: int, label: str):
+    """
+    Controlled diag(d)^exponent without unitary synthesis.
+
+    The power is taken on the eigenphases, so large exponents stay exact.
+    """
+    phases = np.mod(np.angle(diagonal) * exponent, 2 * np.pi)
+    if len(diagonal) == 2:
+        if np.isclose(phases[0], 0):
+            return CPhaseGate(phases[1], label=f"{label}^{exponent}")
+        qc = QuantumCircuit(2, name=f"c-{label}^{exponent}")
+        qc.p(phases[0], 0)
+        qc.cp(phases[1] - phases[0], 0, 1)
+        return qc.to_gate()
+    # The control is the least significant qubit of the combined diagonal.
+    entries = np.ones(2 * len(diagonal), dtype=complex)
+    entries[1::2] = np.exp(1j * phases)
+    return DiagonalGate(entries.tolist())
+
+def controlled_unitary_gate(unitary: UnitaryGate, exponent: int, U_power: np.ndarray = None):
     """
     Constructs a controlled gate for U^(exponent).
+
+    Results are memoized per (matrix, exponent, label) in a bounded LRU
+    cache. Diagonal unitaries become controlled-phase/diagonal gates
+    directly; otherwise U_power (if the caller already has it) or a matrix
+    power is synthesized once.
     """
-    U_matrix = unitary.to_matrix()
-    U_power = np.linalg.matrix_power(U_matrix, exponent)
+    return _controlled_power(_Matrix(unitary.to_matrix(), U_power), exponent, unitary.label or "U")
+
+@lru_cache(maxsize=CONTROLLED_POWER_CACHE_SIZE)
+def _controlled_power(U: _Matrix, exponent: int, label: str):
+    U_matrix, U_power = U.matrix, U.power
+    # The key object stays in the cache; it does not need to keep the power alive.
+    U.power = None
+    diagonal = np.diag(U_matrix)
+    if np.allclose(U_matrix, np.diag(diagonal)):
+        return _controlled_diagonal_gate(diagonal, exponent, label)
+    if U_power is None:
+        U_power = np.linalg.matrix_power(U_matrix, exponent)
     # Create the unitary gate for U^exponent and then control it.
-    CU_gate = UnitaryGate(U_power, label=f"U^{exponent}").control(1)
-    return CU_gate
+    return UnitaryGate(U_power, label=f"{label}^{exponent}").control(1)
+
+def controlled_powers(unitary: UnitaryGate, n_count: int) -> list:
+    """
+    Controlled U^(2^k) for k = 0 .. n_count - 1, using repeated squaring.
+
+    Each power is derived from the previous one with a single matrix product
+    instead of an independent matrix_power call.
+    """
+    U_power = unitary.to_matrix()
+    gates = []
+    for k in range(n_count):
+        if k > 0:
+            U_power = U_power @ U_power
+        gates.append(controlled_unitary_gate(unitary, 2 ** k, U_power))
+    return gates
 
 def qpe_circuit(n_count: int, unitary: UnitaryGate) -> QuantumCircuit:
     """
@@ -26,8 +96,9 @@ def qpe_circuit(n_count: int, unitary: UnitaryGate) -> QuantumCircuit:
     
     The circuit uses (n_count + 1) qubits: n_count for phase estimation and 1 work qubit.
     The work register is initialized in the eigenstate |1> of U.
-    Controlled operations U^(2^(n_count - j - 1)) are applied for each counting qubit.
-    Then the inverse QFT is applied to the counting register, and the counting register is measured.
+    Controlled operations U^(2^j) are applied for each counting qubit j.
+    Then the inverse QFT is applied to the counting register, and the counting register is measured,
+    so outcome y estimates the eigenphase as y / 2^n_count.
     """
     total_qubits = n_count + 1
     qc = QuantumCircuit(total_qubits, n_count)
@@ -38,11 +109,10 @@ def qpe_circuit(n_count: int, unitary: UnitaryGate) -> QuantumCircuit:
     # 2. Prepare the work register in the eigenstate |1>.
     qc.x(n_count)
     
-    # 3. Apply controlled-U^(2^(n_count - j - 1)) for each counting qubit j.
+    # 3. Apply controlled-U^(2^j) for each counting qubit j (qubit 0 is the least significant).
+    CU_gates = controlled_powers(unitary, n_count)
     for j in range(n_count):
-        exponent = 2 ** (n_count - j - 1)
-        CU_gate = controlled_unitary_gate(unitary, exponent)
-        qc.append(CU_gate, [j, n_count])
+        qc.append(CU_gates[j], [j, n_count])
     
     # 4. Apply the inverse QFT on the counting register.
     qc.append(QFT(n_count, inverse=True, do_swaps=True), list(range(n_count)))
@@ -52,32 +122,124 @@ def qpe_circuit(n_count: int, unitary: UnitaryGate) -> QuantumCircuit:
     
     return qc
 
-# Define the eigenphase to be estimated.
-phi = 5/16  # For example, phi = 0.3125
-U_matrix = np.array([[1, 0], [0, np.exp(2 * np.pi * 1j * phi)]])
-U_gate = UnitaryGate(U_matrix, label="U")
+# Single-qubit unitary diag(1, e^(2*pi*i*phi)) with eigenstate |1> and eigenphase phi.
+def phase_unitary(phi: float) -> UnitaryGate:
+    U_matrix = np.array([[1, 0], [0, np.exp(2 * np.pi * 1j * phi)]])
+    return UnitaryGate(U_matrix, label="U")
+
+def qpe_peak(phis, n_count: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Most likely outcome y (round(N phi) mod N) and its probability for each
+    phase, in O(1) per phase without building the distribution.
+    """
+    N = 2 ** n_count
+    phis = np.atleast_1d(np.asarray(phis, dtype=float))
+    y = np.mod(np.rint(phis * N), N).astype(np.int64)
+    d = np.mod(phis - y / N + 0.5, 1.0) - 0.5
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = np.sin(np.pi * N * d) ** 2 / (N * np.sin(np.pi * d)) ** 2
+    return y, np.where(np.abs(N * d) < 1e-12, 1.0, p)
+
+def fejer_distribution(phis, n_count: int) -> np.ndarray:
+    """
+    Exact QPE outcome probabilities for eigenphases `phis`, shape (len(phis), 2^n_count).
+
+    Outcome y has probability sin^2(pi N d) / (N^2 sin^2(pi d)) with
+    N = 2^n_count and d = phi - y/N (the Fejér kernel), 1 where d is an integer.
+    """
+    N = 2 ** n_count
+    phis = np.atleast_1d(np.asarray(phis, dtype=float))
+    # sin^2(pi N d) = sin^2(pi N phi) for every y, so only the denominator is per outcome.
+    numerator = np.sin(np.pi * N * phis)[:, None] ** 2
+    denominator = np.sin(np.pi * (phis[:, None] - np.arange(N) / N))
+    denominator *= denominator
+    denominator *= N * N
+    probabilities = np.divide(numerator, denominator, out=np.ones_like(denominator), where=denominator > 0)
+    # Next to the peak both factors vanish; use the wrapped evaluation there.
+    peak, peak_probability = qpe_peak(phis, n_count)
+    probabilities[np.arange(len(phis)), peak] = peak_probability
+    return probabilities
+
+def eigenphase_weights(unitary, state=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Eigenphases of `unitary` (a UnitaryGate or matrix) in [0, 1) and the
+    weight of each in the work-register `state` (a statevector, or a basis
+    state index; |1> as in qpe_circuit by default). Diagonal unitaries are
+    read off directly; others are decomposed once (complex Schur form).
+    """
+    U_matrix = unitary.to_matrix() if hasattr(unitary, "to_matrix") else np.asarray(unitary, dtype=complex)
+    dim = len(U_matrix)
+    if state is None:
+        state = 1
+    if np.ndim(state) == 0:
+        index, state = int(state), np.zeros(dim, dtype=complex)
+        state[index] = 1
+    state = np.asarray(state, dtype=complex)
+    diagonal = np.diag(U_matrix)
+    if np.allclose(U_matrix, np.diag(diagonal)):
+        eigenvalues, weights = diagonal, np.abs(state) ** 2
+    else:
+        from scipy.linalg import schur
+        # A unitary is normal, so its Schur form is diagonal with orthonormal Schur vectors.
+        T, Z = schur(U_matrix, output="complex")
+        eigenvalues, weights = np.diag(T), np.abs(Z.conj().T @ state) ** 2
+    keep = weights > 1e-12
+    phases = np.mod(np.angle(eigenvalues[keep]) / (2 * np.pi), 1.0)
+    return phases, weights[keep] / weights[keep].sum()
+
+def qpe_distribution(unitary, n_count: int, state=None) -> np.ndarray:
+    """
+    Exact outcome distribution of qpe_circuit(n_count, unitary), indexed by
+    the measured integer y, without building or simulating the circuit. A
+    work state that mixes eigenstates gives the weighted mixture of kernels.
+    """
+    phases, weights = eigenphase_weights(unitary, state)
+    return weights @ fejer_distribution(phases, n_count)
+
+def circuit_distribution(n_count: int, unitary: UnitaryGate, simulator=None) -> np.ndarray:
+    """The same distribution from a statevector simulation of the circuit, for verification."""
+    simulator = simulator or Aer.get_backend('qasm_simulator')
+    probabilities = exact_probabilities(cached_transpile(qpe_circuit(n_count, unitary), simulator), simulator)
+    distribution = np.zeros(2 ** n_count)
+    for key, p in probabilities.items():
+        distribution[int(key, 2)] = p
+    return distribution
+
+if __name__ == "__main__":
+    # Define the eigenphase to be estimated.
+    phi = 5/16  # For example, phi = 0.3125
+    U_gate = phase_unitary(phi)
+
+    n_count = 4  # Number of counting qubits; increases resolution.
+
+    # Build the QPE circuit.
+    qpe_circ = qpe_circuit(n_count, U_gate)
+
+    # Save the circuit diagram.
+    save_circuit_diagram(qpe_circ, "images/qpe_circuit.png")
 
-n_count = 4  # Number of counting qubits; increases resolution.
+    # Use local simulator.
+    simulator = Aer.get_backend('qasm_simulator')
+    transpiled_qpe = cached_transpile(qpe_circ, simulator)
 
-# Build the QPE circuit.
-qpe_circ = qpe_circuit(n_count, U_gate)
+    # Run simulation.
+    if exact_mode():
+        probabilities = exact_probabilities(transpiled_qpe, simulator)
+    else:
+        probabilities = run_counts(transpiled_qpe, simulator, shots=1000)
 
-# Save the circuit diagram.
-os.makedirs("images", exist_ok=True)
-qpe_circ.draw('mpl', filename="images/qpe_circuit.png")
-plt.close()
-print("Circuit saved to 'images/qpe_circuit.png'")
+    # Plot and save the histogram of measurement outcomes.
+    save_histogram(probabilities, "images/qpe_results.png", title="QPE Results")
 
-# Use local simulator.
-simulator = Aer.get_backend('qasm_simulator')
-transpiled_qpe = transpile(qpe_circ, backend=simulator)
+    # The closed-form distribution gives the same answer without a circuit.
+    analytic = qpe_distribution(U_gate, n_count)
+    top = int(analytic.argmax())
+    print(f"Most likely outcome: {format(top, f'0{n_count}b')} (p={analytic[top]:.3f}), phase estimate {top / 2 ** n_count}")
 
-# Run simulation.
-result = simulator.run(transpiled_qpe, shots=1000).result()
-counts = result.get_counts()
-probabilities = {k: v/1000 for k, v in counts.items()}
+    # Resolution study over 10^5 phases: chance of reading the nearest n_count-bit estimate.
+    phis = np.linspace(0, 1, 100_000, endpoint=False)
+    for n in (2, 4, 6, 8, 10):
+        _, peak_probability = qpe_peak(phis, n)
+        print(f"n_count={n:2d}: P(nearest estimate) mean {peak_probability.mean():.3f}, worst {peak_probability.min():.3f}")
 
-# Plot and save the histogram of measurement outcomes.
-fig = plot_histogram(probabilities, title="QPE Results")
-fig.savefig("images/qpe_results.png", bbox_inches="tight")
-print("Results saved to 'images/qpe_results.png'")
+    render()
@@ -1,51 +1,54 @@
-import os
-from qiskit import QuantumCircuit, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, Session
-from qiskit_ibm_runtime import SamplerV2 as Sampler
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
-
-# Initialize service (assumes credentials are already saved)
-service = QiskitRuntimeService()
-
-# Create Bell state circuit
-qc = QuantumCircuit(2, 2)
-qc.h(0)
-qc.cx(0, 1)
-qc.measure([0, 1], [0, 1])
-
-# Draw circuit
-os.makedirs("images", exist_ok=True)
-qc.draw('mpl', filename="images/bell_circuit_real.png")
-plt.close()
-print("Circuit saved to 'images/bell_circuit_real.png'")
-
-# Get available backends
-backends = service.backends()
-print("Available backends:", [b.name for b in backends])
-
-# Check backend availability
-if not backends:
-    raise RuntimeError("No real quantum devices available. Check your IBM Quantum account")
-
-# Select least busy backend
-backend = min(backends, key=lambda x: x.status().pending_jobs)
-print(f"Using backend: {backend.name}")
-
-# Transpile circuit
-transpiled_qc = transpile(qc, backend=backend)
-
-# Submit job
-with Session(backend=backend) as session:
-    sampler = Sampler(mode=session)
-    job = sampler.run([transpiled_qc], shots=500)
-    sampler_result = job.result()
-
-# Retrieve the measurement counts
-counts = sampler_result[0].data.c.get_counts()
-probabilities = {state: count/500 for state, count in counts.items()}
-
-fig = plot_histogram(probabilities, title="Measurement Results")
-fig.get_axes()[0].set_ylabel("Probability")
-fig.savefig("images/bell_state_results_real.png", bbox_inches="tight")
-print("Results saved to 'images/bell_state_results_real.png'")
\ No newline at end of file
+from transpile_cache import cached_transpile
+from counts import SparseCounts
+from plotting import render, save_circuit_diagram, save_histogram
+from backend_select import select_backend
+from noise_emulator import local_device, noisy_simulator
+from tracing import span
+# Same Bell state circuit as the noiseless simulation in entanglement.py
+from entanglement import bell_circuit
+
+# Fraction of shots outside the ideal {'00', '11'} Bell outcomes.
+def error_rate(counts: dict) -> float:
+    shots = sum(counts.values())
+    return 1 - (counts.get('00', 0) + counts.get('11', 0)) / shots
+
+if __name__ == "__main__":
+    qc = bell_circuit()
+
+    # Draw circuit
+    save_circuit_diagram(qc, "images/bell_circuit_real.png")
+
+    device = local_device()
+    if device:
+        # Offline: emulate the device with its noise model
+        backend = noisy_simulator(device, num_qubits=qc.num_qubits)
+        print(f"Emulating {device} locally")
+    else:
+        # Initialize service (assumes credentials are already saved)
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        with span("runtime.service"):
+            service = QiskitRuntimeService()
+
+        # Select the least busy operational device
+        backend = select_backend(service, min_qubits=qc.num_qubits)
+        print(f"Using backend: {backend.name}")
+
+    # Transpile circuit
+    transpiled_qc = cached_transpile(qc, backend)
+
+    # Submit job (runtime is imported here so importing the circuits stays light)
+    from qiskit_ibm_runtime import Session, SamplerV2 as Sampler
+    with Session(backend=backend) as session:
+        sampler = Sampler(mode=session)
+        with span("job.submit"):
+            job = sampler.run([transpiled_qc], shots=500)
+        with span("job.wait", job_id=job.job_id()):
+            sampler_result = job.result()
+
+    # Retrieve the measurement counts
+    counts = SparseCounts.from_bitarray(sampler_result[0].data.c)
+    print(f"Error rate: {error_rate(counts):.3f}")
+
+    save_histogram(counts, "images/bell_state_results_real.png", title="Measurement Results", ylabel="Probability")
+
+    render()
@@ -0,0 +1,232 @@
+"""
+Persistent store of simulator counts, so repeated experiments are not re-run.
+
+Every run is one row of a SQLite database keyed by the circuit's content
+hash, the backend fingerprint, the shot count, the simulator seed and the
+noise model's hash. Asking again for the same run returns the stored counts;
+only the misses of a batch are simulated, in one job. Runs of the same
+circuit with different seeds are independent samples, and merged() adds
+them up into one larger SparseCounts; top_up() simulates fresh seeds until
+a requested total is stored.
+
+The store is off unless FTLQ_STORE is set: "1" uses .cache/results.sqlite,
+any other value is the database path. The database is in WAL mode with a
+busy timeout and rows are only ever inserted, so parallel sweep workers can
+read and write it at the same time; when two of them simulate the same
+miss, the first row written wins and both return it.
+
+    python result_store.py [PATH]    # list the stored experiments
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import numpy as np
+from qiskit import QuantumCircuit
+from counts import SparseCounts
+from fingerprint import backend_fingerprint, circuit_fingerprint, noise_fingerprint
+from tracing import count, span
+
+DEFAULT_STORE_PATH = os.path.join(os.environ.get("FTLQ_CACHE_DIR", ".cache"), "results.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    key TEXT PRIMARY KEY,
+    circuit TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    noise TEXT NOT NULL,
+    shots INTEGER NOT NULL,
+    seed INTEGER,
+    backend_name TEXT,
+    num_bits INTEGER NOT NULL,
+    outcomes BLOB NOT NULL,
+    counts BLOB NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_experiment ON runs (circuit, backend, noise);
+"""
+
+def store_enabled() -> bool:
+    return bool(os.environ.get("FTLQ_STORE"))
+
+def _store_path() -> str:
+    value = os.environ.get("FTLQ_STORE", "1")
+    return DEFAULT_STORE_PATH if value == "1" else value
+
+def _run(backend, circuits, shots: int, seed: int | None):
+    options = {"shots": shots} if seed is None else {"shots": shots, "seed_simulator": seed}
+    return backend.run(circuits, **options).result()
+
+def _counts_from_row(num_bits: int, outcomes: bytes, counts: bytes) -> SparseCounts:
+    return SparseCounts(np.frombuffer(outcomes, dtype=np.uint64), np.frombuffer(counts, dtype=np.uint32), num_bits)
+
+class ResultStore:
+    """
+    SQLite table of counts keyed by (circuit, backend, noise model, shots, seed).
+
+    A seed of None is a key of its own: the first unseeded run is stored and
+    returned for every later unseeded request with the same shots.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, timeout: float = 60.0):
+        self.path = path
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not cross a fork, so each process opens its own.
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def _execute(self, sql: str, params=()) -> list | int:
+        with self._lock:
+            cursor = self._connect().execute(sql, params)
+            return cursor.fetchall() if cursor.description else cursor.rowcount
+
+    @staticmethod
+    def key(circuit: str, backend: str, noise: str, shots: int, seed: int | None) -> str:
+        return hashlib.sha256(f"{circuit}|{backend}|{noise}|{shots}|{seed}".encode()).hexdigest()
+
+    def get(self, key: str) -> SparseCounts | None:
+        rows = self._execute("SELECT num_bits, outcomes, counts FROM runs WHERE key = ?", (key,))
+        return _counts_from_row(*rows[0]) if rows else None
+
+    def put(self, key: str, counts: SparseCounts, circuit: str, backend: str, noise: str,
+            shots: int, seed: int | None, backend_name: str | None = None) -> SparseCounts:
+        """Store a run and return the stored counts (another writer's, if it got there first)."""
+        inserted = self._execute(
+            "INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, circuit, backend, noise, shots, seed, backend_name, counts.num_bits,
+             np.ascontiguousarray(counts.outcomes).tobytes(), counts.counts.tobytes(), time.time()))
+        return counts if inserted else self.get(key)
+
+    def run(self, circuits, backend, shots: int, seed: int | None = None):
+        """
+        Counts of one circuit or a list run on `backend`, like
+        SparseCounts.from_result(backend.run(...).result()).
+
+        Stored runs are returned as they are; the misses are simulated in a
+        single job and stored.
+        """
+        single = isinstance(circuits, QuantumCircuit)
+        circuits = [circuits] if single else list(circuits)
+        with span("result_store.lookup", circuits=len(circuits)):
+            backend_key, noise_key = backend_fingerprint(backend), noise_fingerprint(backend)
+            circuit_keys = [circuit_fingerprint(circuit) for circuit in circuits]
+            keys = [self.key(c, backend_key, noise_key, shots, seed) for c in circuit_keys]
+            results = [self.get(key) for key in keys]
+        # Identical circuits in the same batch are simulated only once.
+        missing = {}
+        for i, result in enumerate(results):
+            if result is None:
+                missing.setdefault(keys[i], []).append(i)
+        self.hits += len(circuits) - sum(map(len, missing.values()))
+        self.misses += len(missing)
+        count("result_store.hits", len(circuits) - sum(map(len, missing.values())))
+        count("result_store.misses", len(missing))
+        if missing:
+            batch = [circuits[indices[0]] for indices in missing.values()]
+            with span("simulate", circuits=len(batch), shots=shots) as s:
+                s.record_circuit(batch)
+                result = _run(backend, batch, shots, seed)
+            for experiment, (key, indices) in enumerate(missing.items()):
+                stored = self.put(key, SparseCounts.from_result(result, experiment), circuit_keys[indices[0]],
+                                  backend_key, noise_key, shots, seed, getattr(backend, "name", None))
+                for i in indices:
+                    results[i] = stored
+        return results[0] if single else results
+
+    def runs(self, circuit: QuantumCircuit, backend) -> list[tuple[int, int | None]]:
+        """(shots, seed) of every stored run of `circuit` on `backend`."""
+        return self._execute(
+            "SELECT shots, seed FROM runs WHERE circuit = ? AND backend = ? AND noise = ? ORDER BY created",
+            (circuit_fingerprint(circuit), backend_fingerprint(backend), noise_fingerprint(backend)))
+
+    def merged(self, circuit: QuantumCircuit, backend) -> SparseCounts | None:
+        """
+        All stored runs of `circuit` on `backend` added together, or None.
+
+        Runs with the same seed share their first shots, so only the largest
+        run of each seed is counted; unseeded runs are all independent.
+        """
+        rows = self._execute(
+            "SELECT seed, shots, num_bits, outcomes, counts FROM runs "
+            "WHERE circuit = ? AND backend = ? AND noise = ?",
+            (circuit_fingerprint(circuit), backend_fingerprint(backend), noise_fingerprint(backend)))
+        largest = {}
+        for i, (seed, shots, *row) in enumerate(rows):
+            group = ("run", i) if seed is None else ("seed", seed)
+            if group not in largest or shots > largest[group][0]:
+                largest[group] = (shots, row)
+        if not largest:
+            return None
+        return SparseCounts.merge(*(_counts_from_row(*row) for _, row in largest.values()))
+
+    def top_up(self, circuit: QuantumCircuit, backend, total_shots: int) -> SparseCounts:
+        """Merged counts of at least `total_shots`, simulating only the shots not stored yet."""
+        merged = self.merged(circuit, backend)
+        have = merged.total if merged is not None else 0
+        if have < total_shots:
+            # A fresh seed makes the new shots independent of every stored run.
+            seed = random.SystemRandom().randrange(2 ** 31)
+            self.run(circuit, backend, total_shots - have, seed)
+            merged = self.merged(circuit, backend)
+        return merged
+
+    def stats(self) -> dict:
+        (runs, shots), = self._execute("SELECT COUNT(*), COALESCE(SUM(shots), 0) FROM runs")
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "runs": runs,
+            "shots": shots,
+            "bytes": os.path.getsize(self.path),
+        }
+
+_default_store = None
+
+def default_store() -> ResultStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = ResultStore(_store_path())
+    return _default_store
+
+def run_counts(circuits, backend, shots: int, seed: int | None = None):
+    """
+    SparseCounts of one circuit or a list, through the shared store when
+    FTLQ_STORE is set and straight from the backend otherwise. The scripts
+    hand these to save_histogram, which normalizes them to probabilities.
+    """
+    if store_enabled():
+        return default_store().run(circuits, backend, shots, seed)
+    with span("simulate", shots=shots) as s:
+        s.record_circuit(circuits)
+        result = _run(backend, circuits, shots, seed)
+    if isinstance(circuits, QuantumCircuit):
+        return SparseCounts.from_result(result)
+    return [SparseCounts.from_result(result, i) for i in range(len(result.results))]
+
+if __name__ == "__main__":
+    store = ResultStore(sys.argv[1] if len(sys.argv) > 1 else _store_path())
+    rows = store._execute(
+        "SELECT backend_name, circuit, noise != '', COUNT(*), SUM(shots) FROM runs "
+        "GROUP BY circuit, backend, noise ORDER BY MAX(created) DESC")
+    for backend_name, circuit, noisy, runs, shots in rows:
+        print(f"{circuit[:12]}  {backend_name or '-':<26} {'noisy' if noisy else 'ideal':<6}"
+              f" {runs:>4} runs {shots:>10} shots")
+    print(store.stats())
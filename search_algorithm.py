@@ -1,27 +1,28 @@
-import os
-from qiskit import QuantumCircuit, transpile
+from qiskit import QuantumCircuit
 from qiskit_aer import Aer
-from qiskit.visualization import plot_histogram
 import math
-import matplotlib.pyplot as plt
+from transpile_cache import cached_transpile
+from exact import exact_mode, exact_probabilities
+from counts import SparseCounts
+from plotting import render, save_circuit_diagram, save_histogram
+from grover import diffuser_gate
+from adaptive import adaptive_mode, adaptive_run, backend_shots, exact_shots, top_outcome_decision
+from result_store import run_counts
 
 def grover_diffuser(n_qubits: int) -> QuantumCircuit:
     qc = QuantumCircuit(n_qubits, name="Diffuser")
-    qc.h(range(n_qubits))
-    qc.x(range(n_qubits))
-    qc.h(n_qubits - 1)
-    qc.mcx(list(range(n_qubits - 1)), n_qubits - 1)
-    qc.h(n_qubits - 1)
-    qc.x(range(n_qubits))
-    qc.h(range(n_qubits))
+    qc.append(diffuser_gate(n_qubits), range(n_qubits))
     return qc
 
 def quantum_search(num_qubits: int, oracle: QuantumCircuit, iterations: int = 1) -> QuantumCircuit:
     qc = QuantumCircuit(num_qubits, num_qubits)
     qc.h(range(num_qubits))
+    # The oracle and the (memoized) diffuser are built once and appended as gates.
+    oracle_gate = oracle.to_gate()
+    diffuser = diffuser_gate(num_qubits)
     for _ in range(iterations):
-        qc.compose(oracle, inplace=True)
-        qc.compose(grover_diffuser(num_qubits), inplace=True)
+        qc.append(oracle_gate, range(num_qubits))
+        qc.append(diffuser, range(num_qubits))
     qc.measure(range(num_qubits), range(num_qubits))
     return qc
 
@@ -32,29 +33,40 @@ def oracle() -> QuantumCircuit:
     oracle.ch(0,2)
     return oracle
 
-# Parameters
-num_qubits = 5
-iterations = round((math.pi / 4) * math.sqrt(2 ** num_qubits / 2))
+if __name__ == "__main__":
+    # Parameters
+    num_qubits = 5
+    iterations = round((math.pi / 4) * math.sqrt(2 ** num_qubits / 2))
 
-# Create circuit
-search_circuit = quantum_search(num_qubits, oracle(), iterations)
+    # Create circuit
+    search_circuit = quantum_search(num_qubits, oracle(), iterations)
 
-# Draw circuit
-os.makedirs("images", exist_ok=True)
-search_circuit.draw('mpl', filename="images/search_circuit.png")
-plt.close()
-print("Circuit saved to 'images/search_circuit.png'")
+    # Draw circuit
+    save_circuit_diagram(search_circuit, "images/search_circuit.png")
 
-# Use local simulator
-simulator = Aer.get_backend('qasm_simulator')
-transpiled_search = transpile(search_circuit, backend=simulator)
+    # Use local simulator
+    simulator = Aer.get_backend('qasm_simulator')
+    transpiled_search = cached_transpile(search_circuit, simulator)
 
-# Run simulation
-result = simulator.run(transpiled_search, shots=1000).result()
-counts = result.get_counts()
-probabilities = {k: v/1000 for k, v in counts.items()}
+    # Run simulation
+    if adaptive_mode():
+        # Stop once the winning state clearly beats the runner-up.
+        if exact_mode():
+            run_shots = exact_shots(transpiled_search, simulator)
+        else:
+            run_shots = backend_shots(simulator, transpiled_search)
+        outcome = adaptive_run(run_shots, top_outcome_decision(), max_shots=1000)
+        print(f"Most probable state: {outcome.decision}, decided after {outcome.shots_used} shots ({outcome.shots_saved} of 1000 saved)")
+        probabilities = SparseCounts.from_dict(outcome.counts)
+    elif exact_mode():
+        probabilities = exact_probabilities(transpiled_search, simulator)
+    else:
+        probabilities = run_counts(transpiled_search, simulator, shots=1000)
+    if not adaptive_mode():
+        state, value = max(probabilities.items(), key=lambda item: item[1])
+        print(f"Most probable state: {state} (p={value / sum(probabilities.values()):.3f})")
 
-# Plot results
-fig = plot_histogram(probabilities, title="Quantum Search Results")
-fig.savefig("images/search_results.png", bbox_inches="tight")
-print("Results saved to 'images/search_results.png'")
\ No newline at end of file
+    # Plot results
+    save_histogram(probabilities, "images/search_results.png", title="Quantum Search Results")
+
+    render()
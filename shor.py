@@ -1,10 +1,15 @@
+import argparse
+import math
+import random
+from fractions import Fraction
 import numpy as np
-import os
-from qiskit import QuantumCircuit, transpile
-from qiskit.circuit.library import QFT, UnitaryGate
+from qiskit import QuantumCircuit
+from qiskit.circuit.library import QFT, QFTGate, UnitaryGate
 from qiskit_aer import Aer
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
+from transpile_cache import cached_transpile
+from exact import exact_mode, exact_probabilities
+from plotting import render, save_circuit_diagram, save_histogram
+from result_store import run_counts
 
 def mod_mult_unitary(a: int, N: int, n: int) -> np.ndarray:
     dim = 2 ** n
@@ -17,16 +22,101 @@ def mod_mult_unitary(a: int, N: int, n: int) -> np.ndarray:
         U[result, y] = 1
     return U
 
-def shor_circuit_custom(N: int, a: int, t: int = 4, n: int = 4) -> QuantumCircuit:
+# Gate-level modular arithmetic (Beauregard, "Circuit for Shor's algorithm
+# using 2n+3 qubits"). Additions are done in Fourier space, so every adder is
+# a layer of (multi-)controlled phase gates and the circuit size is polynomial
+# in n instead of the 4^n entries of mod_mult_unitary.
+
+def phi_add(qc: QuantumCircuit, a: int, b: list, controls: list = ()) -> None:
+    """Add the constant a to the Fourier-space register b (mod 2^len(b))."""
+    m = len(b)
+    for j, qubit in enumerate(b):
+        theta = 2 * np.pi * ((a * 2 ** j) % 2 ** m) / 2 ** m
+        if theta == 0:
+            continue
+        if controls:
+            qc.mcp(theta, list(controls), qubit)
+        else:
+            qc.p(theta, qubit)
+
+def phi_add_mod(qc: QuantumCircuit, a: int, N: int, b: list, ancilla: int, controls: list) -> None:
+    """
+    Controlled |b> -> |(b + a) mod N> on the Fourier-space register b.
+
+    b has one more qubit than N needs (the overflow bit), and the ancilla
+    starts and ends in |0>. Requires 0 <= a, b < N.
+    """
+    qft = QFTGate(len(b))
+    iqft = qft.inverse()
+    msb = b[-1]
+    phi_add(qc, a, b, controls)
+    phi_add(qc, -N, b)
+    qc.append(iqft, b)
+    qc.cx(msb, ancilla)
+    qc.append(qft, b)
+    phi_add(qc, N, b, [ancilla])
+    phi_add(qc, -a, b, controls)
+    qc.append(iqft, b)
+    qc.x(msb)
+    qc.cx(msb, ancilla)
+    qc.x(msb)
+    qc.append(qft, b)
+    phi_add(qc, a, b, controls)
+
+def c_mult_add_mod(a: int, N: int, n: int) -> QuantumCircuit:
+    """
+    |c>|x>|b>|0> -> |c>|x>|(b + c*a*x) mod N>|0>.
+
+    Qubit layout: control, x (n qubits), b (n + 1 qubits), ancilla.
+    """
+    qc = QuantumCircuit(2 * n + 3, name=f"CMult_{a}")
+    control, x, b, ancilla = 0, list(range(1, n + 1)), list(range(n + 1, 2 * n + 2)), 2 * n + 2
+    qc.append(QFTGate(n + 1), b)
+    for i, x_qubit in enumerate(x):
+        phi_add_mod(qc, (a * 2 ** i) % N, N, b, ancilla, [control, x_qubit])
+    qc.append(QFTGate(n + 1).inverse(), b)
+    return qc
+
+def c_mod_mult_gate(a: int, N: int, n: int):
+    """
+    Controlled |x> -> |a*x mod N> built from modular adders.
+
+    Same qubit layout as c_mult_add_mod; the b register and the ancilla are
+    scratch space that start and end in |0>. a must be coprime to N.
+    """
+    a_inv = pow(a, -1, N)
+    qc = QuantumCircuit(2 * n + 3, name=f"Mult_{a}")
+    qc.append(c_mult_add_mod(a, N, n).to_gate(), range(2 * n + 3))
+    for i in range(n):
+        qc.cswap(0, 1 + i, n + 1 + i)
+    qc.append(c_mult_add_mod(a_inv, N, n).to_gate().inverse(), range(2 * n + 3))
+    return qc.to_gate(label=f"Mult_{a}")
+
+def shor_circuit_custom(N: int, a: int, t: int = 4, n: int = 4, method: str = "dense") -> QuantumCircuit:
+    """
+    Order-finding circuit for a mod N with t counting qubits.
+
+    method="dense" wraps a 2^n x 2^n permutation matrix per counting qubit
+    (only practical for toy sizes). method="arithmetic" uses the gate-level
+    modular multiplier and needs t + 2n + 2 qubits. Either way the work
+    register starts in |1>, so any n >= N.bit_length() works.
+    """
+    if method == "arithmetic":
+        return shor_circuit_arithmetic(N, a, t, n)
     qc = QuantumCircuit(t + n, t)
     qc.h(range(t))
-    qc.x(t + n - 1)
+    qc.x(t)
 
     for j in range(t):
         factor = pow(a, 2 ** j, N)
         U = mod_mult_unitary(factor, N, n)
-        mult_gate = UnitaryGate(U, label=f"Mult_{factor}")
-        c_mult_gate = mult_gate.control(1)
+        # Controlled-U as one block-diagonal matrix (control is the lowest
+        # qubit): simulators apply it directly, while UnitaryGate.control()
+        # would synthesize a multi-controlled decomposition first.
+        c_U = np.zeros((2 * len(U), 2 * len(U)), dtype=complex)
+        c_U[0::2, 0::2] = np.eye(len(U))
+        c_U[1::2, 1::2] = U
+        c_mult_gate = UnitaryGate(c_U, label=f"c-Mult_{factor}")
         qc.append(c_mult_gate, [j] + list(range(t, t + n)))
     
     qc.append(QFT(t, inverse=True, do_swaps=True), range(t))
@@ -34,29 +124,182 @@ def shor_circuit_custom(N: int, a: int, t: int = 4, n: int = 4) -> QuantumCircui
     
     return qc
 
-N = 15
-a = 7
-t = 4
-n = 4
+def shor_circuit_arithmetic(N: int, a: int, t: int, n: int) -> QuantumCircuit:
+    if n < N.bit_length():
+        raise ValueError(f"n={n} work qubits cannot hold N={N}")
+    qc = QuantumCircuit(t + 2 * n + 2, t)
+    qc.h(range(t))
+    qc.x(t)
+
+    for j in range(t):
+        factor = pow(a, 2 ** j, N)
+        qc.append(c_mod_mult_gate(factor, N, n), [j] + list(range(t, t + 2 * n + 2)))
+
+    qc.append(QFT(t, inverse=True, do_swaps=True), range(t))
+    qc.measure(range(t), range(t))
+    
+    return qc
+
+# Classical post-processing: the measured phase k/2^t is close to s/r, so the
+# period r is the denominator of a continued-fraction approximation.
+
+# Periods already found, keyed by (a, N); None means the run gave no period.
+_period_cache = {}
+
+def candidate_periods(counts: dict, t: int, N: int, min_weight: float = 0.01) -> list[int]:
+    """
+    Denominators of the continued-fraction approximations of every outcome
+    holding at least `min_weight` of the counts, most frequent first.
+    """
+    total = sum(counts.values())
+    candidates = []
+    for bits, weight in sorted(counts.items(), key=lambda item: item[1], reverse=True):
+        if weight / total < min_weight:
+            break
+        r = Fraction(int(bits, 2), 2 ** t).limit_denominator(N - 1).denominator
+        if r > 1 and r not in candidates:
+            candidates.append(r)
+    return candidates
+
+def find_period(counts: dict, a: int, N: int, t: int) -> int | None:
+    """
+    The order of a mod N from order-finding counts, or None.
+
+    When s/r has a common factor the denominator is only a divisor of r, so
+    small multiples of each candidate and lcms of candidate pairs are tried too.
+    """
+    candidates = candidate_periods(counts, t, N)
+    tried = set()
+    for r in candidates + [math.lcm(x, y) for i, x in enumerate(candidates) for y in candidates[i + 1:]]:
+        for multiple in range(r, N, r):
+            if multiple in tried:
+                continue
+            tried.add(multiple)
+            if pow(a, multiple, N) == 1:
+                return multiple
+    return None
+
+def factors_from_period(a: int, N: int, r: int) -> tuple[int, int] | None:
+    """Non-trivial factors gcd(a^(r/2) ± 1, N), or None if r is unusable."""
+    if r % 2:
+        return None
+    x = pow(a, r // 2, N)
+    if x == N - 1:
+        return None
+    for candidate in (math.gcd(x - 1, N), math.gcd(x + 1, N)):
+        if 1 < candidate < N:
+            return candidate, N // candidate
+    return None
+
+def shor_sizes(N: int) -> tuple[int, int]:
+    """Counting qubits t = 2n and work qubits n needed to factor N."""
+    n = N.bit_length()
+    return 2 * n, n
+
+def find_periods(pairs: list, simulator=None, shots: int = 1000, method: str = "dense") -> dict:
+    """
+    Run order finding for every uncached (a, N) pair as one simulator job and
+    return {(a, N): period or None}.
+    """
+    todo = list(dict.fromkeys(pair for pair in pairs if pair not in _period_cache))
+    if todo:
+        simulator = simulator or Aer.get_backend('qasm_simulator')
+        sizes = [shor_sizes(N) for _, N in todo]
+        circuits = [shor_circuit_custom(N, a, t, n, method) for (a, N), (t, n) in zip(todo, sizes)]
+        transpiled = cached_transpile(circuits, simulator)
+        if exact_mode():
+            all_counts = [exact_probabilities(circuit, simulator) for circuit in transpiled]
+        else:
+            all_counts = run_counts(transpiled, simulator, shots)
+        for (a, N), (t, _), counts in zip(todo, sizes, all_counts):
+            _period_cache[a, N] = find_period(counts, a, N, t)
+    return {pair: _period_cache[pair] for pair in pairs}
+
+def classical_factor(N: int) -> int | None:
+    """A factor of N found without order finding (even N or perfect powers)."""
+    if N % 2 == 0:
+        return 2
+    for k in range(2, N.bit_length() + 1):
+        root = round(N ** (1 / k))
+        for base in (root - 1, root, root + 1):
+            if base > 1 and base ** k == N:
+                return base
+    return None
+
+def factor_semiprimes(numbers: list[int], bases_per_round: int = 2, max_rounds: int = 5,
+                      simulator=None, shots: int = 1000, method: str = "dense", seed: int | None = None) -> dict:
+    """
+    Factor every number in `numbers`, returning {N: (p, q) or None}.
+
+    Each round draws up to `bases_per_round` untried bases a for every number
+    still unfactored and runs all their order-finding circuits in one job.
+    """
+    rng = random.Random(seed)
+    factors = {}
+    tried = {N: set() for N in numbers}
+    for N in numbers:
+        p = classical_factor(N)
+        if p:
+            factors[N] = (p, N // p)
+    for _ in range(max_rounds):
+        pending = [N for N in numbers if N not in factors]
+        pairs = []
+        for N in pending:
+            untried = [a for a in range(2, N - 1) if a not in tried[N]]
+            for a in rng.sample(untried, min(bases_per_round, len(untried))):
+                tried[N].add(a)
+                g = math.gcd(a, N)
+                if g > 1:
+                    # A lucky base already shares a factor with N.
+                    factors[N] = (g, N // g)
+                    break
+                pairs.append((a, N))
+        pairs = [(a, N) for a, N in pairs if N not in factors]
+        if not pairs:
+            break
+        for (a, N), r in find_periods(pairs, simulator, shots, method).items():
+            if N not in factors and r is not None:
+                found = factors_from_period(a, N, r)
+                if found:
+                    factors[N] = found
+    return {N: factors.get(N) for N in numbers}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order finding for a = 7, N = 15 on the local simulator")
+    parser.add_argument("--factor", type=int, nargs="+", metavar="N", default=[],
+                        help="also factor these numbers, batching the bases of each round into one job")
+    args = parser.parse_args()
+
+    N = 15
+    a = 7
+    t = 4
+    n = 4
+
+    shor_qc = shor_circuit_custom(N, a, t, n)
+
+    # Save circuit diagram
+    save_circuit_diagram(shor_qc, "images/shor_circuit.png")
+
+    # Use local simulator
+    simulator = Aer.get_backend('qasm_simulator')
+    transpiled_shor = cached_transpile(shor_qc, simulator)
 
-shor_qc = shor_circuit_custom(N, a, t, n)
+    # Run simulation
+    if exact_mode():
+        probabilities = exact_probabilities(transpiled_shor, simulator)
+    else:
+        probabilities = run_counts(transpiled_shor, simulator, shots=1000)
 
-# Save circuit diagram
-os.makedirs("images", exist_ok=True)
-shor_qc.draw('mpl', filename="images/shor_circuit.png")
-plt.close()
-print("Circuit saved to 'images/shor_circuit.png'")
+    # Plot results
+    save_histogram(probabilities, "images/shor_results.png", title="Shor's Algorithm Results")
 
-# Use local simulator
-simulator = Aer.get_backend('qasm_simulator')
-transpiled_shor = transpile(shor_qc, backend=simulator)
+    # Read the period off the counts with continued fractions
+    r = find_period(probabilities, a, N, t)
+    print(f"Period of {a} mod {N}: {r}, factors: {factors_from_period(a, N, r) if r else None}")
 
-# Run simulation
-result = simulator.run(transpiled_shor, shots=1000).result()
-counts = result.get_counts()
-probabilities = {k: v / 1000 for k, v in counts.items()}
+    # Factor the requested numbers as one pipeline, batching bases per job
+    if args.factor:
+        for number, found in factor_semiprimes(args.factor, simulator=simulator).items():
+            print(f"{number} = {found[0]} x {found[1]}" if found else f"{number}: no factors found")
 
-# Plot results
-fig = plot_histogram(probabilities, title="Shor's Algorithm Results")
-fig.savefig("images/shor_results.png", bbox_inches="tight")
-print("Results saved to 'images/shor_results.png'")
+    render()
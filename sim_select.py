@@ -0,0 +1,115 @@
+"""
+Pick the cheapest Aer simulation method that can run a circuit.
+
+- Circuits made only of Clifford gates (H, S, X, CX, ...) go to the
+  stabilizer method, whose cost is polynomial in the number of qubits, so
+  Bernstein-Vazirani, Deutsch-Jozsa, Simon and Bell circuits run at 100+
+  qubits.
+- Small circuits use the dense statevector method, which is fastest below a
+  couple of dozen qubits.
+- Wider circuits whose entanglement stays low use the matrix-product-state
+  method. Each gate spanning a cut multiplies the bond dimension there by
+  at most its operator Schmidt rank: 2 for controlled gates and rotations
+  like RZZ, 4 for SWAP, iSWAP and general two-qubit unitaries.
+
+The thresholds come from benchmarks/bench_sim_select.py. Aer's MPS target
+reports 63 qubits, so wider MPS circuits must be run without transpiling
+against it (using gates Aer supports natively).
+"""
+from functools import lru_cache
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.circuit import ControlledGate
+from qiskit_aer import AerSimulator
+
+CLIFFORD_GATES = {
+    "id", "x", "y", "z", "h", "s", "sdg", "sx", "sxdg",
+    "cx", "cy", "cz", "swap", "iswap", "dcx", "ecr",
+}
+# Instructions every method accepts that do not change the state's structure.
+NON_GATES = {"measure", "barrier", "reset", "delay"}
+
+# Two-qubit gates of operator Schmidt rank 2 that are not ControlledGates.
+RANK_TWO_GATES = {"rxx", "ryy", "rzz", "rzx", "ecr"}
+
+# Above this many qubits, stabilizer beats statevector on Clifford circuits.
+STABILIZER_MIN_QUBITS = 14
+# Up to this many qubits, dense statevector is used for non-Clifford circuits.
+STATEVECTOR_MAX_QUBITS = 18
+# Matrix product states are used while log2 of the bond dimension bound stays below this.
+MPS_MAX_BOND_LOG2 = 10
+
+def is_clifford(circuit: QuantumCircuit) -> bool:
+    """True if every gate, after expanding custom gates, is a Clifford gate."""
+    for instruction in circuit.data:
+        operation = instruction.operation
+        if operation.name in CLIFFORD_GATES or operation.name in NON_GATES:
+            continue
+        if getattr(operation, "condition", None) is not None or operation.definition is None:
+            return False
+        if not is_clifford(operation.definition):
+            return False
+    return True
+
+def _bond_log2_weight(operation) -> int:
+    """Upper bound on how much one gate raises log2 of the bond dimension at any cut it spans."""
+    if isinstance(operation, ControlledGate) or operation.name in RANK_TWO_GATES:
+        return 1
+    if operation.name == "unitary" and operation.num_qubits == 2:
+        # Operator Schmidt rank across the two qubits (qubit 0 is the low bit).
+        matrix = np.asarray(operation.to_matrix()).reshape(2, 2, 2, 2).transpose(0, 2, 1, 3).reshape(4, 4)
+        return int(np.ceil(np.log2(np.linalg.matrix_rank(matrix, tol=1e-10))))
+    # A cut through k qubits leaves at most k // 2 on the smaller side, each adding 2.
+    return 2 * (operation.num_qubits // 2)
+
+def bond_log2_bound(circuit: QuantumCircuit) -> int:
+    """
+    Upper bound on log2 of the MPS bond dimension over all cuts, in the
+    circuit's qubit order.
+    """
+    n = circuit.num_qubits
+    if n < 2:
+        return 0
+    crossings = np.zeros(n, dtype=int)
+    for instruction in circuit.data:
+        if len(instruction.qubits) < 2 or instruction.operation.name in NON_GATES:
+            continue
+        indices = [circuit.find_bit(q).index for q in instruction.qubits]
+        weight = _bond_log2_weight(instruction.operation)
+        crossings[min(indices)] += weight
+        crossings[max(indices)] -= weight
+    # Cut c separates qubits 0..c from c+1..n-1.
+    per_cut = np.cumsum(crossings)[:-1]
+    sizes = np.minimum(np.arange(1, n), np.arange(n - 1, 0, -1))
+    return int(np.minimum(per_cut, sizes).max())
+
+def select_method(circuit: QuantumCircuit) -> str:
+    """The Aer `method` to use for `circuit`."""
+    n = circuit.num_qubits
+    if n > STABILIZER_MIN_QUBITS and is_clifford(circuit):
+        return "stabilizer"
+    if n <= STATEVECTOR_MAX_QUBITS:
+        return "statevector"
+    if bond_log2_bound(circuit) <= MPS_MAX_BOND_LOG2:
+        return "matrix_product_state"
+    if is_clifford(circuit):
+        return "stabilizer"
+    return "statevector"
+
+@lru_cache(maxsize=None)
+def _simulator(method: str) -> AerSimulator:
+    return AerSimulator(method=method)
+
+def simulator_for(circuits) -> AerSimulator:
+    """
+    A shared AerSimulator whose method suits `circuits` (one circuit or a
+    list, e.g. a batch that must run on one backend).
+    """
+    if isinstance(circuits, QuantumCircuit):
+        circuits = [circuits]
+    methods = {select_method(circuit) for circuit in circuits}
+    # A batch needing different methods falls back to the most general one.
+    for method in ("statevector", "matrix_product_state", "stabilizer"):
+        if method in methods:
+            return _simulator(method)
+    return _simulator("statevector")
@@ -1,8 +1,12 @@
-import os
-from qiskit import QuantumCircuit, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, Session, SamplerV2 as Sampler
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
+import numpy as np
+from qiskit import QuantumCircuit
+from transpile_cache import cached_transpile
+from counts import SparseCounts
+from plotting import render, save_circuit_diagram, save_histogram
+from backend_select import select_backend
+from noise_emulator import local_device, noisy_simulator
+from adaptive import adaptive_mode, sampler_shots
+from tracing import span
 
 def bdotz(b, z):
     accum = 0
@@ -15,9 +19,11 @@ def simon_oracle(secret_string: str) -> QuantumCircuit:
     qc = QuantumCircuit(2*n)
     for i in range(n):
         qc.cx(i, i+n)
+    # f(x) = f(x ⊕ s) needs the control to be a bit where s is 1.
+    control = secret_string.find('1')
     for i, bit in enumerate(secret_string):
         if bit == '1':
-            qc.cx(0, i+n)
+            qc.cx(control, i+n)
     return qc
 
 def simon_algorithm(secret_string: str) -> QuantumCircuit:
@@ -31,35 +37,173 @@ def simon_algorithm(secret_string: str) -> QuantumCircuit:
     qc.measure(range(n), list(reversed(range(n))))
     return qc
 
-service = QiskitRuntimeService()
+def pack_bitstrings(bitstrings: list[str]) -> np.ndarray:
+    """
+    Pack equal-length bitstrings into rows of uint64 words (shape (k, ceil(n/64))).
 
-secret = "101"  
-simon_circ = simon_algorithm(secret)
+    Word 0 holds the rightmost 64 characters, so the packing matches int(z, 2).
+    """
+    n = len(bitstrings[0])
+    words = (n + 63) // 64
+    values = [int(z, 2) for z in bitstrings]
+    mask = (1 << 64) - 1
+    return np.array([[(v >> (64 * w)) & mask for w in range(words)] for v in values], dtype=np.uint64)
 
-os.makedirs("images", exist_ok=True)
-simon_circ.draw('mpl', filename="images/simon_circuit.png")
-plt.close()
-print("Circuit saved to 'images/simon_circuit.png'")
+def dot_mod2(packed: np.ndarray, secret_string: str) -> np.ndarray:
+    """secret·z (mod 2) for every packed row z at once."""
+    secret = pack_bitstrings([secret_string])[0]
+    return (np.bitwise_count(packed & secret).sum(axis=1) & 1).astype(int)
 
-backends = service.backends(simulator=False, operational=True)
-if not backends:
-    raise RuntimeError("No real quantum devices available. Check your IBM Quantum account")
-backend = min(backends, key=lambda x: x.status().pending_jobs)
-print(f"Using backend: {backend.name}")
+def check_measurements(secret_string: str, counts: dict) -> dict:
+    """Map every measured string z to secret·z (mod 2), which is 0 without noise."""
+    bitstrings = list(counts)
+    return dict(zip(bitstrings, dot_mod2(pack_bitstrings(bitstrings), secret_string).tolist()))
 
-transpiled_simon = transpile(simon_circ, backend=backend)
+class SimonSolver:
+    """
+    Incremental Gaussian elimination over GF(2) for Simon's algorithm.
 
-with Session(backend=backend) as session:
-    sampler = Sampler(mode=session)
-    job = sampler.run([transpiled_simon], shots=1000)
-    result = job.result()
+    Each measured string z is packed into a Python integer (one bit per
+    qubit, any width) and reduced against the rows seen so far, keeping the
+    system in reduced row echelon form. Once rank n - 1 is reached the
+    secret s is the unique non-zero vector with z·s = 0 for every row.
+    """
 
-counts = result[0].data.c.get_counts()
-probabilities = {k: v/1000 for k, v in counts.items()}
+    def __init__(self, n: int):
+        self.n = n
+        self.pivots = {}  # leading bit -> row with that leading bit
 
-fig = plot_histogram(probabilities, title="Simon's Algorithm Results")
-fig.savefig("images/simon_results.png", bbox_inches="tight")
-print("Results saved to 'images/simon_results.png'")
+    @property
+    def rank(self) -> int:
+        return len(self.pivots)
 
-for z in counts:
-    print('{} ⋅ {} = {} (mod 2)'.format(secret, z, bdotz(secret, z)))
+    @property
+    def solved(self) -> bool:
+        return self.rank >= self.n - 1
+
+    def add(self, z: str) -> bool:
+        """Add one measurement; returns True if it increased the rank."""
+        row = int(z, 2)
+        for bit, pivot_row in self.pivots.items():
+            if row >> bit & 1:
+                row ^= pivot_row
+        if row == 0 or self.solved:
+            return False
+        lead = row.bit_length() - 1
+        for bit, pivot_row in self.pivots.items():
+            if pivot_row >> lead & 1:
+                self.pivots[bit] = pivot_row ^ row
+        self.pivots[lead] = row
+        return True
+
+    def add_counts(self, counts: dict) -> bool:
+        """
+        Add measurements from most to least frequent, stopping at rank n - 1.
+
+        Taking frequent outcomes first keeps rare, noise-induced strings out
+        of the system on real hardware.
+        """
+        for z in sorted(counts, key=counts.get, reverse=True):
+            if self.solved:
+                break
+            self.add(z)
+        return self.solved
+
+    def secret(self) -> str | None:
+        """The hidden string, or None while the rank is still below n - 1."""
+        if self.rank != self.n - 1:
+            return None
+        free = next(bit for bit in range(self.n) if bit not in self.pivots)
+        s = 1 << free
+        for bit, row in self.pivots.items():
+            if row >> free & 1:
+                s |= 1 << bit
+        return format(s, f'0{self.n}b')
+
+def recover_secret(counts: dict) -> str | None:
+    """Solve for s from a full counts dictionary."""
+    solver = SimonSolver(len(next(iter(counts))))
+    solver.add_counts(counts)
+    return solver.secret()
+
+def inconsistent_fraction(secret_string: str, counts: dict) -> float:
+    """Fraction of the shots with secret·z = 1, which a correct secret only gets from noise."""
+    dots = check_measurements(secret_string, counts)
+    return sum(counts[z] for z, dot in dots.items() if dot) / max(sum(counts.values()), 1)
+
+def sample_until_solved(run_shots, n: int, batch_shots: int = 16, max_shots: int = 100_000,
+                        max_inconsistent: float = 0.1, min_checks: int = 16):
+    """
+    Sample in batches of `batch_shots` until the system reaches rank n - 1.
+
+    `run_shots(shots)` must return a counts dictionary. About n shots are
+    needed on average, independent of how wide each string is. A candidate
+    secret is only accepted while at most `max_inconsistent` of the shots so
+    far contradict it, and only once at least `min_checks` shots were checked
+    against it. A noise-induced row yields a wrong secret that about half of
+    the shots contradict; the system is then rebuilt from all counts, most
+    frequent first. Returns the secret (None if max_shots ran out), the
+    accumulated counts and the number of shots used.
+    """
+    solver = SimonSolver(n)
+    counts = {}
+    used = 0
+    while used < max_shots:
+        shots = min(batch_shots, max_shots - used)
+        batch = run_shots(shots)
+        for z, value in batch.items():
+            counts[z] = counts.get(z, 0) + value
+        used += shots
+        if solver.add_counts(batch):
+            secret = solver.secret()
+            if used < min_checks:
+                continue
+            if inconsistent_fraction(secret, counts) <= max_inconsistent:
+                return secret, counts, used
+            solver = SimonSolver(n)
+            solver.add_counts(counts)
+    return None, counts, used
+
+if __name__ == "__main__":
+    secret = "101"  
+    simon_circ = simon_algorithm(secret)
+
+    save_circuit_diagram(simon_circ, "images/simon_circuit.png")
+
+    device = local_device()
+    if device:
+        backend = noisy_simulator(device, num_qubits=simon_circ.num_qubits)
+        print(f"Emulating {device} locally")
+    else:
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        with span("runtime.service"):
+            service = QiskitRuntimeService()
+        backend = select_backend(service, min_qubits=simon_circ.num_qubits)
+        print(f"Using backend: {backend.name}")
+
+    transpiled_simon = cached_transpile(simon_circ, backend)
+
+    from qiskit_ibm_runtime import Session, SamplerV2 as Sampler
+    with Session(backend=backend) as session:
+        sampler = Sampler(mode=session)
+        if adaptive_mode():
+            # Stop as soon as the measured strings pin down the secret.
+            recovered, raw_counts, used = sample_until_solved(sampler_shots(sampler, transpiled_simon),
+                                                              len(secret), max_shots=1000)
+            counts = SparseCounts.from_dict(raw_counts)
+            print(f"Solved after {used} shots ({1000 - used} of 1000 saved)")
+        else:
+            with span("job.submit"):
+                job = sampler.run([transpiled_simon], shots=1000)
+            with span("job.wait", job_id=job.job_id()):
+                result = job.result()
+            counts = SparseCounts.from_bitarray(result[0].data.c)
+            recovered = recover_secret(counts)
+
+    save_histogram(counts, "images/simon_results.png", title="Simon's Algorithm Results")
+
+    for z, dot in check_measurements(secret, counts).items():
+        print('{} ⋅ {} = {} (mod 2)'.format(secret, z, dot))
+    print(f"Secret string recovered by Gaussian elimination: {recovered}")
+
+    render()
@@ -1,32 +1,37 @@
-import os
 from qiskit import QuantumCircuit
-from qiskit_aer import Aer
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
-
-# Create quantum circuit
-qc = QuantumCircuit(1, 1)
-
-# Add H gate
-qc.h(0)
-qc.measure(0, 0)
-
-# Draw and save circuit
-os.makedirs("images", exist_ok=True)
-qc.draw('mpl')
-plt.savefig("images/circuit_visualization.png")
-print("Circuit diagram saved to 'images/circuit_visualization.png'")
-
-# Simulate with 500 shots
-simulator = Aer.get_backend('qasm_simulator')
-result = simulator.run(qc, shots=500).result()
-counts = result.get_counts()
-
-# Convert counts to probabilities
-probabilities = {state: count/500 for state, count in counts.items()}
-
-# Plot probability distribution
-fig = plot_histogram(probabilities)
-fig.get_axes()[0].set_ylabel("Probability")
-plt.savefig("images/probability_distribution.png")
-print("Measurement probabilities saved to 'images/probability_distribution.png'")
\ No newline at end of file
+from exact import exact_mode, exact_probabilities
+from plotting import render, save_circuit_diagram, save_histogram
+from sim_select import simulator_for
+from result_store import run_counts
+
+def superposition_circuit() -> QuantumCircuit:
+    # Create quantum circuit
+    qc = QuantumCircuit(1, 1)
+
+    # Add H gate
+    qc.h(0)
+    qc.measure(0, 0)
+    return qc
+
+if __name__ == "__main__":
+    qc = superposition_circuit()
+
+    # Draw and save circuit
+    save_circuit_diagram(qc, "images/circuit_visualization.png")
+
+    # Simulate with 500 shots
+    simulator = simulator_for(qc)
+    if exact_mode():
+        probabilities = exact_probabilities(qc, simulator)
+    else:
+        probabilities = run_counts(qc, simulator, shots=500)
+
+    # Print the measured probabilities
+    total = sum(probabilities.values())
+    for state, value in sorted(probabilities.items()):
+        print(f"{state}: {value / total:.3f}")
+
+    # Plot probability distribution
+    save_histogram(probabilities, "images/probability_distribution.png", ylabel="Probability")
+
+    render()
@@ -0,0 +1,246 @@
+"""
+Parameter sweeps over the Aer-based algorithms.
+
+Every point of the grid is built and simulated in a process pool sized to
+the machine, and each finished point is streamed to a columnar output:
+a directory of NPZ shards, or a Parquet file when pyarrow is installed.
+
+    python sweep.py qpe --grid phi=0:1:0.01 --grid n_count=4,6,8 --out results/qpe
+    python sweep.py grover --grid num_qubits=3:9:1 --grid marked=0,5 --out results/grover
+    python sweep.py shor --grid N=15,21,33 --grid a=2,4,8 --out shor.parquet
+"""
+import argparse
+import glob
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from qiskit_aer import Aer, AerSimulator
+from exact import exact_mode, exact_probabilities
+from transpile_cache import cached_transpile
+from result_store import run_counts
+
+# Threads each worker's Aer simulator may use; set by _init_worker.
+_aer_threads = 0
+
+def _init_worker(aer_threads: int) -> None:
+    global _aer_threads
+    _aer_threads = aer_threads
+    os.environ["OMP_NUM_THREADS"] = str(aer_threads)
+
+def _simulator() -> AerSimulator:
+    return AerSimulator(max_parallel_threads=_aer_threads)
+
+def _distribution(circuit, simulator: AerSimulator, shots: int) -> dict:
+    """
+    Counts from `shots` samples, or exact probabilities when FTLQ_EXACT=1.
+    With FTLQ_STORE set, workers share one result store, so points already
+    simulated by an earlier sweep are read back instead of re-run.
+    """
+    if exact_mode():
+        return exact_probabilities(circuit, simulator)
+    return run_counts(circuit, simulator, shots)
+
+def _top_outcome(counts: dict) -> tuple[int, float]:
+    top = max(counts, key=counts.get)
+    return int(top, 2), counts[top] / sum(counts.values())
+
+def grover_task(num_qubits: int = 5, marked: int | None = None, iterations: int | None = None,
+                shots: int = 1000) -> dict:
+    """Grover search for one marked state (an integer, default all ones) among 2**num_qubits."""
+    from grover import transpiled_grover
+    marked = 2 ** num_qubits - 1 if marked is None else marked
+    simulator = _simulator()
+    circuit = transpiled_grover(num_qubits, {format(marked, f"0{num_qubits}b")}, simulator, iterations)
+    top, probability = _top_outcome(_distribution(circuit, simulator, shots))
+    return {"top": top, "top_probability": probability, "found": top == marked}
+
+def qpe_task(phi: float = 5 / 16, n_count: int = 4, shots: int = 1000, method: str = "circuit") -> dict:
+    from qpe import phase_unitary, qpe_circuit, qpe_distribution
+    if method == "analytic":
+        # Exact closed-form distribution; no circuit is built or simulated.
+        distribution = qpe_distribution(phase_unitary(phi), n_count)
+        top = int(distribution.argmax())
+        return {"top": top, "top_probability": float(distribution[top]), "estimate": top / 2 ** n_count}
+    simulator = _simulator()
+    circuit = cached_transpile(qpe_circuit(n_count, phase_unitary(phi)), simulator)
+    top, probability = _top_outcome(_distribution(circuit, simulator, shots))
+    return {"top": top, "top_probability": probability, "estimate": top / 2 ** n_count}
+
+def shor_task(N: int = 15, a: int = 7, t: int | None = None, n: int | None = None, shots: int = 1000) -> dict:
+    """Order finding for a mod N; t and n default to the sizes factoring N needs."""
+    from shor import find_period, shor_circuit_custom, shor_sizes
+    default_t, default_n = shor_sizes(N)
+    t, n = t or default_t, n or default_n
+    if n < N.bit_length():
+        raise ValueError(f"n={n} work qubits cannot hold residues mod {N}")
+    simulator = _simulator()
+    circuit = cached_transpile(shor_circuit_custom(N, a, t, n), simulator)
+    counts = _distribution(circuit, simulator, shots)
+    top, probability = _top_outcome(counts)
+    period = find_period(counts, a, N, t) or 0
+    return {"top": top, "top_probability": probability, "outcomes": len(counts), "period": period}
+
+def vqe_task(theta: float = 0.0, phi: float = 0.0, method: str = "cobyla") -> dict:
+    from vqe import run_vqe
+    simulator = Aer.get_backend('statevector_simulator')
+    simulator.set_options(max_parallel_threads=_aer_threads)
+    opt_result, engine = run_vqe([theta, phi], simulator, method=method)
+    return {"energy": float(opt_result.fun), "evaluations": engine.evaluations, "jobs": engine.jobs}
+
+TASKS = {
+    "grover": grover_task,
+    "qpe": qpe_task,
+    "shor": shor_task,
+    "vqe": vqe_task,
+}
+
+def _run_point(task: str, index: int, point: dict) -> dict:
+    start = time.perf_counter()
+    row = {"index": index, **point, **TASKS[task](**point)}
+    row["seconds"] = time.perf_counter() - start
+    return row
+
+class NpzShardWriter:
+    """Writes rows as numbered NPZ files of columns inside a directory."""
+
+    def __init__(self, path: str, rows_per_shard: int = 1000):
+        self.path = path
+        self.rows_per_shard = rows_per_shard
+        self.rows = []
+        self.shards = 0
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, row: dict) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= self.rows_per_shard:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        columns = {key: np.array([row[key] for row in self.rows]) for key in self.rows[0]}
+        np.savez(os.path.join(self.path, f"part-{self.shards:05d}.npz"), **columns)
+        self.shards += 1
+        self.rows = []
+
+    def close(self) -> None:
+        self.flush()
+
+class ParquetShardWriter(NpzShardWriter):
+    """Writes rows as Parquet row groups of a single file (needs pyarrow)."""
+
+    def __init__(self, path: str, rows_per_shard: int = 1000):
+        try:
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet output needs pyarrow (pip install pyarrow); "
+                              "use a directory path for NPZ output instead") from e
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.rows_per_shard = rows_per_shard
+        self.rows = []
+        self.writer = None
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        import pyarrow
+        table = pyarrow.Table.from_pylist(self.rows)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def close(self) -> None:
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+def open_writer(path: str, rows_per_shard: int = 1000):
+    if path.endswith(".parquet"):
+        return ParquetShardWriter(path, rows_per_shard)
+    return NpzShardWriter(path, rows_per_shard)
+
+def load_results(path: str) -> dict:
+    """Read a sweep output back as {column: array}."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet
+        return {k: np.asarray(v) for k, v in pyarrow.parquet.read_table(path).to_pydict().items()}
+    shards = [np.load(f) for f in sorted(glob.glob(os.path.join(path, "part-*.npz")))]
+    if not shards:
+        return {}
+    return {key: np.concatenate([shard[key] for shard in shards]) for key in shards[0].files}
+
+def grid_points(grid: dict) -> list[dict]:
+    """Cartesian product of {name: values} as a list of keyword dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+def sweep(task: str, grid: dict, out: str, workers: int | None = None, rows_per_shard: int = 1000) -> int:
+    """
+    Run `task` on every grid point and stream the rows to `out`.
+
+    Aer threads are split between the workers (cores // workers each) so
+    process-level and simulator-level parallelism do not oversubscribe the
+    machine. Returns the number of points written.
+    """
+    if task not in TASKS:
+        raise ValueError(f"Unknown task {task!r}; choose from {sorted(TASKS)}")
+    cores = os.cpu_count() or 1
+    workers = workers or cores
+    points = grid_points(grid)
+    writer = open_writer(out, rows_per_shard)
+    try:
+        # Spawn rather than fork: forking a process that already ran Aer can
+        # deadlock on its OpenMP thread pool.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(max(1, cores // workers),)) as executor:
+            futures = [executor.submit(_run_point, task, i, point) for i, point in enumerate(points)]
+            for future in as_completed(futures):
+                writer.write(future.result())
+    finally:
+        writer.close()
+    return len(points)
+
+def _parse_value(text: str):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+def parse_grid_option(option: str) -> tuple[str, list]:
+    """
+    'name=1,2,3' lists values; 'name=start:stop:step' is a range, of ints
+    when all three bounds are ints and a numpy.arange of floats otherwise.
+    """
+    name, _, spec = option.partition("=")
+    if not spec:
+        raise argparse.ArgumentTypeError(f"Expected name=values, got {option!r}")
+    if ":" in spec:
+        bounds = [_parse_value(x) for x in spec.split(":")]
+        if len(bounds) != 3 or not all(isinstance(x, (int, float)) for x in bounds):
+            raise argparse.ArgumentTypeError(f"Expected name=start:stop:step, got {option!r}")
+        # Integer ranges stay integers (qubit counts, n_count, shots).
+        if all(isinstance(x, int) for x in bounds):
+            return name, list(range(*bounds))
+        return name, np.arange(*map(float, bounds)).tolist()
+    return name, [_parse_value(v) for v in spec.split(",")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep an algorithm over a parameter grid")
+    parser.add_argument("task", choices=sorted(TASKS))
+    parser.add_argument("--grid", action="append", type=parse_grid_option, default=[],
+                        help="name=v1,v2,... or name=start:stop:step (repeatable)")
+    parser.add_argument("--out", required=True, help="output directory of NPZ shards, or a .parquet file")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--rows-per-shard", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = sweep(args.task, dict(args.grid), args.out, args.workers, args.rows_per_shard)
+    print(f"{written} points written to '{args.out}' in {time.perf_counter() - start:.1f}s")
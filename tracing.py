@@ -0,0 +1,225 @@
+"""
+Opt-in timing spans, counters and circuit metrics for the execution pipeline.
+
+Tracing is off unless FTLQ_TRACE is set: "1" writes .cache/trace.json, any
+other value is the output path. While off, span() hands back one shared
+no-op context manager and count() returns at once, so instrumented hot
+paths cost a function call and a flag check.
+
+At exit the trace is written in Chrome's trace event format (open it in
+chrome://tracing or https://ui.perfetto.dev) and the total time per span
+name is printed to stderr. Spans are complete ("X") events whose arguments
+include circuit metrics (width, depth, 2-qubit gates) where they were
+recorded; counters are "C" events. Spawned worker processes (sweep points,
+plot rendering) write their events to a file named after their parent's
+and their own process ID; the parent merges those files into its own trace
+at exit and prints the one summary.
+"""
+import atexit
+import functools
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+DEFAULT_TRACE_PATH = os.path.join(os.environ.get("FTLQ_CACHE_DIR", ".cache"), "trace.json")
+NON_GATES = {"measure", "barrier", "reset", "delay"}
+
+_path = None
+_events = []
+_counters = defaultdict(float)
+_tracks = {}
+_lock = threading.Lock()
+
+def tracing_enabled() -> bool:
+    return _path is not None
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+def circuit_metrics(circuits) -> dict:
+    """Width, depth, 2-qubit gate count and size of a circuit, or summed over a list."""
+    if hasattr(circuits, "num_qubits"):
+        circuits = [circuits]
+    metrics = {"width": 0, "depth": 0, "two_qubit_gates": 0, "size": 0}
+    for circuit in circuits:
+        metrics["width"] = max(metrics["width"], circuit.num_qubits)
+        metrics["depth"] = max(metrics["depth"], circuit.depth())
+        metrics["two_qubit_gates"] += sum(
+            1 for instruction in circuit.data
+            if len(instruction.qubits) == 2 and instruction.operation.name not in NON_GATES
+        )
+        metrics["size"] += circuit.size()
+    return metrics
+
+def _tid(track: str | None) -> int:
+    """Thread ID for an event: the calling thread, or a named virtual track."""
+    if track is None:
+        return threading.get_ident()
+    with _lock:
+        if track not in _tracks:
+            _tracks[track] = len(_tracks) + 1
+            _events.append({"ph": "M", "name": "thread_name", "pid": os.getpid(),
+                            "tid": _tracks[track], "args": {"name": track}})
+        return _tracks[track]
+
+def add_event(name: str, start_us: float, duration_us: float, track: str | None = None, **args) -> None:
+    """Record a span measured elsewhere (e.g. in a worker process)."""
+    if _path is None:
+        return
+    event = {"ph": "X", "name": name, "ts": start_us, "dur": duration_us,
+             "pid": os.getpid(), "tid": _tid(track), "args": args}
+    with _lock:
+        _events.append(event)
+
+class _Span:
+    __slots__ = ("name", "track", "args", "start")
+
+    def __init__(self, name: str, track: str | None, args: dict):
+        self.name = name
+        self.track = track
+        self.args = args
+
+    def set(self, **args) -> None:
+        self.args.update(args)
+
+    def record_circuit(self, circuits) -> None:
+        self.args.update(circuit_metrics(circuits))
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        add_event(self.name, self.start, _now_us() - self.start, self.track, **self.args)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **args) -> None:
+        pass
+
+    def record_circuit(self, circuits) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name: str, track: str | None = None, **args):
+    """
+    Context manager timing a block. `track` puts the span on a named
+    timeline instead of the calling thread's (for overlapping async waits).
+    """
+    if _path is None:
+        return _NULL_SPAN
+    return _Span(name, track, args)
+
+def traced(name: str | None = None):
+    """Decorator wrapping every call of a function in a span."""
+    def decorate(fn):
+        label = name or fn.__qualname__
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(name: str, value: float = 1) -> None:
+    """Add `value` to a counter, recorded with its running total."""
+    if _path is None:
+        return
+    with _lock:
+        _counters[name] += value
+        _events.append({"ph": "C", "name": name, "ts": _now_us(), "pid": os.getpid(),
+                        "tid": threading.get_ident(), "args": {"value": _counters[name]}})
+
+def summary(events: list | None = None) -> dict:
+    """{span name: (calls, total seconds)} over `events`, or the spans recorded so far."""
+    totals = defaultdict(lambda: [0, 0.0])
+    with _lock:
+        events = list(_events if events is None else events)
+    for event in events:
+        if event["ph"] == "X":
+            totals[event["name"]][0] += 1
+            totals[event["name"]][1] += event["dur"] / 1e6
+    return {name: tuple(total) for name, total in totals.items()}
+
+def _worker_path(parent_pid: int, pid: int | str) -> str:
+    root, ext = os.path.splitext(_path)
+    return f"{root}.{parent_pid}-{pid}{ext}"
+
+def _output_path() -> str:
+    parent = multiprocessing.parent_process()
+    return _path if parent is None else _worker_path(parent.pid, os.getpid())
+
+def write_trace(path: str | None = None, events: list | None = None, counters: dict | None = None) -> str:
+    path = path or _output_path()
+    with _lock:
+        trace = {"traceEvents": list(_events if events is None else events), "displayTimeUnit": "ms",
+                 "otherData": {"counters": dict(_counters if counters is None else counters), "argv": sys.argv}}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(trace, f, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+def _merge_worker_traces() -> tuple[list, dict]:
+    """This process's events and counters plus those of its finished workers, whose files are removed."""
+    with _lock:
+        events, counters = list(_events), defaultdict(float, _counters)
+    for path in sorted(glob.glob(_worker_path(os.getpid(), "*"))):
+        try:
+            with open(path) as f:
+                trace = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        events.extend(trace["traceEvents"])
+        for name, value in trace["otherData"]["counters"].items():
+            counters[name] += value
+        os.remove(path)
+    return events, dict(counters)
+
+def _write_at_exit() -> None:
+    if multiprocessing.parent_process() is not None:
+        # Workers leave their events for the parent to merge, and stay quiet.
+        if _events:
+            write_trace()
+        return
+    events, counters = _merge_worker_traces()
+    if not events:
+        return
+    path = write_trace(_path, events, counters)
+    totals = sorted(summary(events).items(), key=lambda item: -item[1][1])
+    processes = len({event["pid"] for event in events})
+    print(f"Trace written to {path}" + (f" ({processes} processes)" if processes > 1 else ""), file=sys.stderr)
+    for name, (calls, seconds) in totals:
+        print(f"  {name:<24} {calls:>6} x {seconds:>9.4f} s", file=sys.stderr)
+    for name, value in sorted(counters.items()):
+        print(f"  {name:<24} {value:>g}", file=sys.stderr)
+
+def enable(path: str = DEFAULT_TRACE_PATH) -> None:
+    """
+    Start tracing to `path` (written at exit), as FTLQ_TRACE does. Spawned
+    workers write next to it, and this process merges their files at exit.
+    """
+    global _path
+    if _path is None:
+        atexit.register(_write_at_exit)
+    _path = path
+
+if os.environ.get("FTLQ_TRACE"):
+    enable(DEFAULT_TRACE_PATH if os.environ["FTLQ_TRACE"] == "1" else os.environ["FTLQ_TRACE"])
@@ -0,0 +1,174 @@
+import hashlib
+import io
+import os
+import qiskit
+from qiskit import QuantumCircuit, qpy, transpile
+from fingerprint import backend_fingerprint, circuit_fingerprint
+from tracing import count, span
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("FTLQ_CACHE_DIR", ".cache"), "transpile")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def _use_parameters_of(circuit: QuantumCircuit, source: QuantumCircuit) -> None:
+    """
+    Swap the Parameters of a cached circuit for the caller's ones of the same
+    name: parameters are hashed by name, so a hit may come from a circuit
+    built with other Parameter objects, which the caller could not bind.
+    """
+    if not circuit.parameters:
+        return
+    by_name = {parameter.name: parameter for parameter in source.parameters}
+    mapping = {parameter: by_name[parameter.name] for parameter in circuit.parameters
+               if by_name.get(parameter.name, parameter) is not parameter}
+    if mapping:
+        circuit.assign_parameters(mapping, inplace=True)
+
+class TranspileCache:
+    """
+    On-disk cache of transpiled circuits stored as QPY files.
+
+    Entries are keyed by the circuit's content hash, the backend target
+    fingerprint, the optimization level and any extra transpile options.
+    Reading an entry refreshes its modification time, and the least recently
+    used entries are evicted once the cache grows past `max_bytes`. The
+    directory is only rescanned when this process's writes could have pushed
+    it over the limit, or after every `max_bytes // 16` bytes written, which
+    bounds the overshoot from other processes writing to the same cache.
+    Entries removed by another process are treated as misses.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Cache size at the last scan, and bytes this process has written since.
+        self._scanned_bytes = None
+        self._written_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, circuit: QuantumCircuit, backend, optimization_level=None, **options) -> str:
+        parts = [
+            circuit_fingerprint(circuit),
+            backend_fingerprint(backend),
+            str(optimization_level),
+            repr(sorted(options.items())),
+            qiskit.__version__,
+        ]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.qpy")
+
+    def get(self, key: str) -> QuantumCircuit | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                circuit = qpy.load(f)[0]
+        except (FileNotFoundError, qpy.QpyError):
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since it was read; the circuit is still good.
+            pass
+        return circuit
+
+    def put(self, key: str, circuit: QuantumCircuit) -> None:
+        buffer = io.BytesIO()
+        qpy.dump(circuit, buffer)
+        # Write to a temporary file first so concurrent readers never see a partial entry.
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, self._path(key))
+        self._written_bytes += buffer.getbuffer().nbytes
+        if (self._scanned_bytes is None or self._scanned_bytes + self._written_bytes > self.max_bytes
+                or self._written_bytes > self.max_bytes // 16):
+            self.evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, name) of every entry still on disk."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".qpy"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                self.evictions += 1
+            except FileNotFoundError:
+                # Another process evicted it first.
+                pass
+            total -= size
+        self._scanned_bytes, self._written_bytes = total, 0
+
+    def transpile(self, circuits, backend, optimization_level=None, **options):
+        """
+        Drop-in replacement for `qiskit.transpile` on one circuit or a list.
+
+        Only the cache misses are transpiled, in a single `transpile` call.
+        """
+        single = isinstance(circuits, QuantumCircuit)
+        circuits = [circuits] if single else list(circuits)
+        with span("transpile_cache.lookup", circuits=len(circuits)):
+            keys = [self.key(c, backend, optimization_level, **options) for c in circuits]
+            results = [self.get(key) for key in keys]
+        # Identical circuits in the same batch are transpiled only once.
+        missing = {}
+        for i, result in enumerate(results):
+            if result is None:
+                missing.setdefault(keys[i], []).append(i)
+        self.hits += sum(result is not None for result in results)
+        self.misses += len(missing)
+        count("transpile_cache.hits", sum(result is not None for result in results))
+        count("transpile_cache.misses", len(missing))
+        if missing:
+            with span("transpile", circuits=len(missing), backend=getattr(backend, "name", None)) as s:
+                transpiled = transpile([circuits[indices[0]] for indices in missing.values()], backend=backend,
+                                       optimization_level=optimization_level, **options)
+                s.record_circuit(transpiled)
+            for (key, indices), circuit in zip(missing.items(), transpiled):
+                self.put(key, circuit)
+                results[indices[0]] = circuit
+                for i in indices[1:]:
+                    results[i] = circuit.copy()
+        # Names are not part of the key; keep the caller's, as transpile does.
+        for i, circuit in enumerate(results):
+            circuit.name = circuits[i].name
+            _use_parameters_of(circuit, circuits[i])
+        return results[0] if single else results
+
+    def stats(self) -> dict:
+        sizes = [size for _, size, _ in self._entries()]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+        }
+
+_default_cache = None
+
+def default_cache() -> TranspileCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TranspileCache()
+    return _default_cache
+
+def cached_transpile(circuits, backend, optimization_level=None, **options):
+    """`transpile` through the shared on-disk cache."""
+    return default_cache().transpile(circuits, backend, optimization_level, **options)
@@ -1,16 +1,17 @@
+import json
 import os
 from qiskit import QuantumCircuit, transpile
+from qiskit.circuit import Parameter, ParameterExpression, ParameterVector
 from qiskit_aer import Aer
-from qiskit.visualization import plot_histogram
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy.optimize import minimize
+from hamiltonian import IsingHamiltonian
+from fingerprint import circuit_fingerprint
+from result_store import run_counts
+from plotting import render, save_circuit_diagram, save_histogram
+from tracing import span
 
 # Define the Hamiltonian: H = Z0 + Z1 + Z0*Z1.
-def hamiltonian_energy(bitstring: str) -> float:
-    z0 = 1 if bitstring[0] == '0' else -1
-    z1 = 1 if bitstring[1] == '0' else -1
-    return z0 + z1 + (z0 * z1)
+hamiltonian = IsingHamiltonian([("IZ", 1.0), ("ZI", 1.0), ("ZZ", 1.0)])
 
 # Define a simple ansatz circuit for two qubits using two parameters.
 def ansatz_circuit(params):
@@ -21,52 +22,263 @@ def ansatz_circuit(params):
     qc.ry(phi, 1)
     return qc
 
-# Cost function for VQE, using statevector simulation.
-def cost_function(params):
-    qc = ansatz_circuit(params)
-    simulator = Aer.get_backend('statevector_simulator')
-    result = simulator.run(qc).result()
-    state = np.asarray(result.get_statevector(qc))
-    energy = 0.0
-    basis_states = ['00', '01', '10', '11']
-    for i, amplitude in enumerate(state):
-        prob = np.abs(amplitude)**2
-        energy += prob * hamiltonian_energy(basis_states[i])
-    return energy
+# Same ansatz, built once with symbolic parameters so it can be rebound cheaply.
+def parameterized_ansatz() -> tuple[QuantumCircuit, ParameterVector]:
+    params = ParameterVector("θ", 2)
+    return ansatz_circuit(params), params
+
+def hardware_efficient_ansatz(num_qubits: int, layers: int = 1,
+                              rotations: tuple = ("ry",)) -> tuple[QuantumCircuit, ParameterVector]:
+    """
+    Layered ansatz: a rotation on every qubit for each gate in `rotations`,
+    then a CX chain, repeated `layers` times and closed by a final rotation
+    layer. It has num_qubits * len(rotations) * (layers + 1) parameters.
+    """
+    params = ParameterVector("θ", num_qubits * len(rotations) * (layers + 1))
+    qc = QuantumCircuit(num_qubits)
+    index = 0
+    for layer in range(layers + 1):
+        for rotation in rotations:
+            for qubit in range(num_qubits):
+                getattr(qc, rotation)(params[index], qubit)
+                index += 1
+        if layer < layers:
+            for qubit in range(num_qubits - 1):
+                qc.cx(qubit, qubit + 1)
+    return qc, params
+
+# Gates generated by a single Pauli operator, for which the two-term parameter-shift rule is exact.
+SHIFT_RULE_GATES = {"rx", "ry", "rz", "p", "rxx", "ryy", "rzz", "rzx"}
+
+def supports_parameter_shift(circuit: QuantumCircuit) -> bool:
+    """True if every parameter drives exactly one Pauli rotation, unscaled."""
+    seen = set()
+    for instruction in circuit.data:
+        for param in instruction.operation.params:
+            if not isinstance(param, ParameterExpression):
+                continue
+            if instruction.operation.name not in SHIFT_RULE_GATES or not isinstance(param, Parameter) \
+                    or param in seen:
+                return False
+            seen.add(param)
+    return True
+
+class VQEEngine:
+    """
+    Statevector VQE evaluator that builds and transpiles the ansatz once.
+
+    Every cost evaluation only binds new parameter values to the already
+    transpiled circuit, and `energies` evaluates many parameter sets in a
+    single simulator job (useful for gradient or population optimizers).
+
+    `energy_fn` maps a batch of statevectors (shape (k, 2^n)) to k energies,
+    e.g. `IsingHamiltonian.expectation`. When the ansatz allows it,
+    `value_and_gradient` uses the parameter-shift rule with all 2p shifted
+    circuits (plus the unshifted one) bound into that single job.
+    """
+
+    def __init__(self, ansatz: QuantumCircuit, params, energy_fn, simulator=None):
+        self.params = list(params)
+        self.energy_fn = energy_fn
+        self.simulator = simulator or Aer.get_backend('statevector_simulator')
+        with span("transpile") as s:
+            self.circuit = transpile(ansatz, backend=self.simulator)
+            s.record_circuit(self.circuit)
+        self.num_qubits = ansatz.num_qubits
+        self.ansatz_key = circuit_fingerprint(ansatz)
+        self.shift_rule = supports_parameter_shift(ansatz)
+        self.evaluations = 0
+        self.jobs = 0
+
+    def statevectors(self, param_sets) -> np.ndarray:
+        """Return one statevector per row of `param_sets`, from a single job."""
+        values = np.atleast_2d(np.asarray(param_sets, dtype=float))
+        binds = [{p: values[:, k].tolist() for k, p in enumerate(self.params)}]
+        with span("simulate", parameter_sets=len(values)):
+            result = self.simulator.run(self.circuit, parameter_binds=binds).result()
+        self.jobs += 1
+        self.evaluations += len(values)
+        return np.array([np.asarray(result.get_statevector(i)) for i in range(len(values))])
+
+    def energies(self, param_sets) -> np.ndarray:
+        return np.atleast_1d(self.energy_fn(self.statevectors(param_sets)))
+
+    def energy(self, params) -> float:
+        return float(self.energies([params])[0])
+
+    def value_and_gradient(self, params) -> tuple[float, np.ndarray]:
+        """Energy and its exact gradient at `params`, from one simulator job."""
+        if not self.shift_rule:
+            raise ValueError("The ansatz does not support parameter-shift gradients")
+        params = np.asarray(params, dtype=float)
+        p = len(params)
+        # Rows: params, then params + pi/2 e_i, then params - pi/2 e_i.
+        shifts = np.concatenate([np.zeros((1, p)), np.eye(p) * np.pi / 2, -np.eye(p) * np.pi / 2])
+        energies = self.energies(params + shifts)
+        return float(energies[0]), (energies[1:p + 1] - energies[p + 1:]) / 2
+
+    def gradient(self, params) -> np.ndarray:
+        return self.value_and_gradient(params)[1]
+
+# Adam on a function returning (value, gradient); returns the best point seen.
+def adam(value_and_gradient, initial_params, maxiter: int = 200, learning_rate: float = 0.1,
+         beta1: float = 0.9, beta2: float = 0.999, epsilon: float = 1e-8, gtol: float = 1e-5):
+    x = np.asarray(initial_params, dtype=float).copy()
+    m = np.zeros_like(x)
+    v = np.zeros_like(x)
+    best_x, best_fun, best_jac = x.copy(), np.inf, None
+    step = 0
+    for step in range(1, maxiter + 1):
+        fun, jac = value_and_gradient(x)
+        if fun < best_fun:
+            best_x, best_fun, best_jac = x.copy(), fun, jac
+        if np.linalg.norm(jac) < gtol:
+            break
+        m = beta1 * m + (1 - beta1) * jac
+        v = beta2 * v + (1 - beta2) * jac ** 2
+        x -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + epsilon)
+    nfev = step
+    if best_jac is None:
+        # No iterations: report the initial point.
+        best_fun, best_jac = value_and_gradient(x)
+        nfev = 1
+    from scipy.optimize import OptimizeResult
+    converged = np.linalg.norm(best_jac) < gtol
+    return OptimizeResult(x=best_x, fun=best_fun, jac=best_jac, nit=step, nfev=nfev, success=converged,
+                          message="Gradient norm below gtol" if converged else "Maximum iterations reached")
+
+OPTIMIZERS = ("cobyla", "l-bfgs-b", "adam")
+
+# Minimize the engine's energy, for at most `maxiter` iterations if given. COBYLA is
+# gradient-free (one job per evaluation); L-BFGS-B and Adam use parameter-shift gradients.
+def optimize(engine: VQEEngine, initial_params, maxiter: int | None = None, method: str = "cobyla"):
+    # scipy is only loaded once an optimization actually runs.
+    from scipy.optimize import minimize
+    method = method.lower()
+    options = {"maxiter": maxiter} if maxiter is not None else None
+    if method == "cobyla":
+        return minimize(engine.energy, initial_params, method='COBYLA', options=options)
+    if method == "l-bfgs-b":
+        return minimize(engine.value_and_gradient, initial_params, jac=True, method='L-BFGS-B', options=options)
+    if method == "adam":
+        return adam(engine.value_and_gradient, initial_params, 200 if maxiter is None else maxiter)
+    raise ValueError(f"Unknown optimizer {method!r}; expected one of {OPTIMIZERS}")
+
+DEFAULT_WARM_START_PATH = os.path.join(os.environ.get("FTLQ_CACHE_DIR", ".cache"), "vqe_params.json")
+
+class WarmStartCache:
+    """
+    Optimal parameters of earlier runs, stored as JSON per ansatz.
+
+    `nearest` returns the parameters found for the closest stored
+    Hamiltonian (Euclidean distance between coefficient vectors) on the same
+    ansatz, if it lies within `max_distance` relative to the new
+    Hamiltonian's norm, so a sweep over couplings starts each point near the
+    previous optimum.
+    """
+
+    def __init__(self, path: str = DEFAULT_WARM_START_PATH, max_distance: float = 0.5, max_entries: int = 1000):
+        self.path = path
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> list:
+        try:
+            with open(self.path) as f:
+                return json.load(f)["entries"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return []
+
+    @staticmethod
+    def _distance(a: dict, b: dict) -> float:
+        return float(np.sqrt(sum((a.get(label, 0.0) - b.get(label, 0.0)) ** 2 for label in set(a) | set(b))))
+
+    def nearest(self, ising: IsingHamiltonian, ansatz_key: str) -> np.ndarray | None:
+        terms = ising.coefficients
+        norm = self._distance(terms, {}) or 1.0
+        candidates = [entry for entry in self._load() if entry["ansatz"] == ansatz_key]
+        best = min(candidates, key=lambda entry: self._distance(terms, entry["terms"]), default=None)
+        if best is None or self._distance(terms, best["terms"]) > self.max_distance * norm:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return np.array(best["params"])
+
+    def store(self, ising: IsingHamiltonian, ansatz_key: str, params, energy: float) -> None:
+        terms = ising.coefficients
+        entries = [entry for entry in self._load() if not (entry["ansatz"] == ansatz_key and entry["terms"] == terms)]
+        entries.append({"ansatz": ansatz_key, "terms": terms, "params": list(map(float, params)),
+                        "energy": float(energy)})
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"entries": entries[-self.max_entries:]}, f)
+        os.replace(tmp_path, self.path)
 
 # Optimize parameters using a classical optimizer.
-initial_params = [0.0, 0.0]
-opt_result = minimize(cost_function, initial_params, method='COBYLA')
-optimal_params = opt_result.x
-optimal_energy = opt_result.fun
-
-print("Optimal parameters:", optimal_params)
-print("Optimal energy:", optimal_energy)
-
-# Build the final ansatz circuit with the optimal parameters.
-ansatz = ansatz_circuit(optimal_params)
-
-# Create a new circuit with classical registers.
-final_circuit = QuantumCircuit(2, 2)
-final_circuit.compose(ansatz, inplace=True)
-final_circuit.measure([0, 1], [1, 0])
-
-# Save the circuit diagram.
-os.makedirs("images", exist_ok=True)
-final_circuit.draw('mpl', filename="images/vqe_circuit.png")
-plt.close()
-print("Circuit saved to 'images/vqe_circuit.png'")
-
-# Run on the local qasm_simulator.
-simulator = Aer.get_backend('qasm_simulator')
-transpiled_circuit = transpile(final_circuit, backend=simulator)
-result = simulator.run(transpiled_circuit, shots=1000).result()
-counts = result.get_counts()
-
-# Normalize counts to probabilities.
-probabilities = {state: count/1000 for state, count in counts.items()}
-
-# Plot and save the histogram.
-fig = plot_histogram(probabilities, title="VQE Results")
-fig.savefig("images/vqe_results.png", bbox_inches="tight")
-print("Results saved to 'images/vqe_results.png'")
+def run_vqe(initial_params=None, simulator=None, maxiter: int | None = None, method: str = "cobyla",
+            ising: IsingHamiltonian | None = None, ansatz=None, warm_start: WarmStartCache | None = None,
+            seed: int | None = None):
+    """
+    Minimize <H> for `ising` (the module's Hamiltonian by default) over
+    `ansatz`, a (circuit, parameters) pair (the two-parameter ansatz by
+    default). Without `initial_params`, the warm-start cache's nearest
+    optimum is used, else random angles. Returns (OptimizeResult, engine).
+    """
+    ising = ising or hamiltonian
+    ansatz, ansatz_params = ansatz or parameterized_ansatz()
+    engine = VQEEngine(ansatz, ansatz_params, ising.expectation, simulator)
+    if initial_params is None and warm_start is not None:
+        initial_params = warm_start.nearest(ising, engine.ansatz_key)
+    if initial_params is None:
+        initial_params = np.random.default_rng(seed).uniform(0, 2 * np.pi, len(engine.params))
+    opt_result = optimize(engine, initial_params, maxiter, method)
+    if warm_start is not None:
+        warm_start.store(ising, engine.ansatz_key, opt_result.x, opt_result.fun)
+    return opt_result, engine
+
+# The ansatz with the given parameters, measured for sampling.
+def measured_ansatz(params) -> QuantumCircuit:
+    qc = QuantumCircuit(2, 2)
+    qc.compose(ansatz_circuit(params), inplace=True)
+    qc.measure([0, 1], [1, 0])
+    return qc
+
+if __name__ == "__main__":
+    initial_params = [0.0, 0.0]
+    opt_result, engine = run_vqe(initial_params)
+    optimal_params = opt_result.x
+    optimal_energy = opt_result.fun
+
+    print("Optimal parameters:", optimal_params)
+    print("Optimal energy:", optimal_energy)
+    print(f"Cost evaluations: {engine.evaluations} ({engine.jobs} simulator jobs)")
+    print("Exact ground state energy:", hamiltonian.ground_state_energy())
+
+    # A larger Ising chain on a layered ansatz, with parameter-shift gradients batched
+    # into one job per L-BFGS step and a warm start from earlier runs of nearby chains.
+    chain = IsingHamiltonian.chain([0.3] * 8, [0.8] * 7)
+    chain_result, chain_engine = run_vqe(method="l-bfgs-b", ising=chain, ansatz=hardware_efficient_ansatz(8, 2),
+                                         warm_start=WarmStartCache(), seed=0)
+    print(f"8-qubit chain: energy {chain_result.fun:.4f} (exact {chain.ground_state_energy():.4f}) "
+          f"in {chain_engine.jobs} simulator jobs")
+
+    # Build the final ansatz circuit with the optimal parameters, with classical registers.
+    final_circuit = measured_ansatz(optimal_params)
+
+    # Save the circuit diagram.
+    save_circuit_diagram(final_circuit, "images/vqe_circuit.png")
+
+    # Run on the local qasm_simulator.
+    simulator = Aer.get_backend('qasm_simulator')
+    with span("transpile") as s:
+        transpiled_circuit = transpile(final_circuit, backend=simulator)
+        s.record_circuit(transpiled_circuit)
+    probabilities = run_counts(transpiled_circuit, simulator, shots=1000)
+
+    # Plot and save the histogram.
+    save_histogram(probabilities, "images/vqe_results.png", title="VQE Results")
+
+    render()